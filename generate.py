@@ -0,0 +1,179 @@
+"""
+Command line entry point for all the generators.
+
+    python3 generate.py list
+    python3 generate.py render horizon1 --width 1920 --height 1080 --seed 3 -o h.png
+    python3 generate.py render aphex --seed 1 --rows 8 --columns 14 --dry-run
+    python3 generate.py batch jobs.json --output-dir out --dry-run
+
+render takes each of the generator's parameters (see generators.GENERATORS)
+as an option.  batch renders a JSON list of jobs in renderd.py's format:
+
+    [{"generator": "sl", "params": {"scale": 85, "seed": 1}, "output": "sl.png"}]
+
+Jobs without an output are written to <generator>-<index><extension>.  Every
+job is checked before anything is rendered, and --dry-run stops there and
+prints the plan.  Generators, and numpy, PIL and svgwrite with them, are only
+imported once rendering starts, so listing and checking are quick.
+"""
+import argparse
+import collections
+import json
+import os
+import time
+
+import generators
+
+# a job checked and ready to render
+Job = collections.namedtuple('Job', ['generator', 'params', 'output'])
+
+def plan(jobs, output_dir=None):
+    """
+    Checks jobs (dicts as in a jobs file) and returns them as Jobs, raising
+    ValueError for the first invalid one or if two would write the same file.
+    """
+    if not isinstance(jobs, list):
+        raise ValueError('expected a list of jobs')
+
+    planned = []
+    outputs = {}
+    for (i, job) in enumerate(jobs):
+        try:
+            if not isinstance(job, dict):
+                raise ValueError('expected an object, got {!r}'.format(job))
+            name = job['generator']
+            params = job.get('params', {})
+            generators.validate(name, params)
+            output = job.get('output')
+            if output is not None and not isinstance(output, str):
+                raise ValueError('output must be a string, got {!r}'.format(output))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError('job {}: {}'.format(i, e))
+
+        output = output or '{}-{}{}'.format(
+            name, i, generators.lookup(name).extension
+        )
+        if output_dir is not None:
+            output = os.path.join(output_dir, output)
+        output = os.path.abspath(output)
+        if output in outputs:
+            raise ValueError('jobs {} and {} both write {}'.format(
+                outputs[output], i, output
+            ))
+        outputs[output] = i
+        planned.append(Job(name, params, output))
+
+    return planned
+
+def render(jobs, cache_dir=None, out=None):
+    """
+    Renders planned Jobs in order, printing each output and its render time.
+    """
+    cache = None
+    if cache_dir is not None:
+        # rendercache imports numpy
+        import rendercache
+        cache = rendercache.Cache(cache_dir)
+
+    for job in jobs:
+        os.makedirs(os.path.dirname(job.output), exist_ok=True)
+        start = time.perf_counter()
+        generators.render(job.generator, job.output, cache, **job.params)
+        elapsed = (time.perf_counter() - start) * 1000
+        print('{} ({:.1f} ms)'.format(job.output, elapsed), file=out)
+
+def print_plan(jobs, out=None):
+    for job in jobs:
+        print('{} {} -> {}'.format(
+            job.generator, json.dumps(job.params, sort_keys=True), job.output
+        ), file=out)
+
+def print_list(out=None):
+    for (name, generator) in sorted(generators.GENERATORS.items()):
+        print('{} ({}, {})'.format(name, generator.directory, generator.extension), file=out)
+        for param in generator.params:
+            line = '    --{} {}, default {}'.format(
+                param.name.replace('_', '-'), param.kind, param.default
+            )
+            if param.choices is not None:
+                line += ', one of {}'.format(', '.join(param.choices))
+            if param.minimum is not None:
+                line += ', at least {}'.format(param.minimum)
+            if param.maximum is not None:
+                line += ', at most {}'.format(param.maximum)
+            print(line, file=out)
+
+def add_param(parser, param):
+    def parse(text):
+        try:
+            value = generators.PARSERS[param.kind](text)
+            generators.check_value(param, value)
+        except ValueError as e:
+            # argparse only passes on the message of an ArgumentTypeError
+            raise argparse.ArgumentTypeError(str(e))
+        return value
+
+    parser.add_argument(
+        '--' + param.name.replace('_', '-'), dest=param.name, type=parse,
+        default=argparse.SUPPRESS, metavar=param.kind.upper(),
+        help='default {}'.format(param.default)
+    )
+
+def add_run_options(parser):
+    parser.add_argument('--dry-run', action='store_true',
+        help='check and print the plan without rendering')
+    parser.add_argument('--cache-dir',
+        help='cache generated strokes and fields here (see rendercache.py)')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the generators.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    commands.add_parser('list', help='list generators and their parameters')
+
+    render_parser = commands.add_parser('render', help='render one file')
+    render_generators = render_parser.add_subparsers(dest='generator')
+    render_generators.required = True
+    for (name, generator) in sorted(generators.GENERATORS.items()):
+        generator_parser = render_generators.add_parser(name)
+        for param in generator.params:
+            add_param(generator_parser, param)
+        generator_parser.add_argument('-o', '--output',
+            help='defaults to {}{}'.format(name, generator.extension))
+        add_run_options(generator_parser)
+
+    batch_parser = commands.add_parser('batch', help='render a jobs file')
+    batch_parser.add_argument('jobs', help='JSON list of jobs')
+    batch_parser.add_argument('--output-dir',
+        help='directory that job outputs are relative to')
+    add_run_options(batch_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        print_list()
+        return
+
+    if args.command == 'render':
+        specs = generators.lookup(args.generator).params
+        params = {p.name: getattr(args, p.name) for p in specs if hasattr(args, p.name)}
+        output = args.output or args.generator + generators.lookup(args.generator).extension
+        jobs = [{'generator': args.generator, 'params': params, 'output': output}]
+        output_dir = None
+    else:
+        with open(args.jobs) as f:
+            jobs = json.load(f)
+        output_dir = args.output_dir
+
+    try:
+        planned = plan(jobs, output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.dry_run:
+        print_plan(planned)
+        return
+    render(planned, args.cache_dir)
+
+if __name__ == '__main__':
+    main()
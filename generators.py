@@ -0,0 +1,231 @@
+"""
+Registry of the generators in this repo.  Each one lives in its own project
+directory as a script with an entry point (usually main()) that renders one
+output file; load() makes them importable from anywhere in the repo.
+
+Parameters are described here too, so they can be checked without importing
+the generators and the numpy, PIL or svgwrite they need (see generate.py).
+"""
+import collections
+import importlib
+import json
+import math
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROFILE_ENV_VAR = 'GENERATIVE_PROFILE'
+
+# A parameter of a generator's entry point that can be set from the command
+# line or a jobs file.  kind is one of PARSERS.  A default of None means the
+# generator picks, e.g. a random seed.  Numbers can be limited to the range
+# minimum to maximum, inclusive.
+Param = collections.namedtuple(
+    'Param', ['name', 'kind', 'default', 'choices', 'minimum', 'maximum'],
+    defaults=[None, None, None]
+)
+
+# function is the module's entry point.  cacheable generators take a
+# rendercache.Cache as its cache parameter.  params lists the entry point's
+# parameters that take plain values; others, like aphex's overrides, are only
+# available from Python.  check, if any, is called with the parameters, with
+# defaults filled in, to raise ValueError for combinations the entry point
+# would reject.
+Generator = collections.namedtuple(
+    'Generator',
+    ['directory', 'module', 'extension', 'cacheable', 'function', 'params', 'check'],
+    defaults=['main', (), None]
+)
+
+def number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def boolean(text):
+    if text.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if text.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError('expected true or false, got {!r}'.format(text))
+
+PARSERS = {
+    'int': int,
+    'number': number,
+    'bool': boolean,
+    'str': str,
+    'json': json.loads,
+}
+
+# the value types each kind accepts, with bools excluded from the numbers
+TYPES = {
+    'int': int,
+    'number': (int, float),
+    'bool': bool,
+    'str': str,
+    'json': object,
+}
+
+SEED = Param('seed', 'int', None)
+PREVIEW = Param('preview', 'int', None, minimum=1)
+
+# the smallest scale sl's sheet of strokes fits at, see sl.check_scale
+SL_MIN_SCALE = 5.125
+
+# draw_horizons needs at least two rows for each of its horizons
+HORIZON1_MIN_HEIGHT = 4
+
+def check_aphex(params):
+    if params['incremental'] and params['seed'] is None:
+        raise ValueError('incremental rendering needs a seed')
+
+def check_sl(params):
+    if params['preview'] is not None and params['scale'] / params['preview'] < SL_MIN_SCALE:
+        raise ValueError('preview {} shrinks the sheet below scale {}'.format(
+            params['preview'], SL_MIN_SCALE
+        ))
+
+def check_sl_poster(params):
+    # poster_strokes needs room for the widest stroke, 5 pixels, per stroke
+    (scale, count) = (params['scale'], params['count'])
+    if (int(16 * scale) - 2 * int(scale / 2)) / count < 5:
+        raise ValueError('{} strokes do not fit at scale {}'.format(count, scale))
+
+def check_horizon1(params):
+    preview = params['preview']
+    if preview is not None and (
+        params['width'] // preview < 1
+        or params['height'] // preview < HORIZON1_MIN_HEIGHT
+    ):
+        raise ValueError('preview {} shrinks a {}x{} image below 1x{}'.format(
+            preview, params['width'], params['height'], HORIZON1_MIN_HEIGHT
+        ))
+
+GENERATORS = {
+    'aphex': Generator('letterforms', 'aphex', '.svg', False, params=(
+        Param('precision', 'int', None, minimum=0),
+        Param('construction', 'bool', True),
+        SEED,
+        Param('rows', 'int', 4, minimum=1),
+        Param('columns', 'int', 7, minimum=1),
+        Param('tip_radius', 'number', 10),
+        Param('pit_radius', 'number', 5),
+        Param('arm_lengths', 'json', (60, 101)),
+        Param('incremental', 'bool', False),
+    ), check=check_aphex),
+    'sl': Generator('straightlines', 'sl', '.png', True, params=(
+        Param('scale', 'number', 100 * 4.6825, minimum=SL_MIN_SCALE),
+        SEED,
+        PREVIEW,
+    ), check=check_sl),
+    'sl-poster': Generator('straightlines', 'sl', '.png', False, 'poster', (
+        Param('scale', 'number', 100 * 4.6825),
+        Param('count', 'int', 200, minimum=1),
+        SEED,
+        Param('processes', 'int', None, minimum=1),
+    ), check_sl_poster),
+    'horizon1': Generator('landscapes', 'horizon1', '.png', True, params=(
+        Param('width', 'int', 960, minimum=1),
+        Param('height', 'int', 540, minimum=HORIZON1_MIN_HEIGHT),
+        SEED,
+        PREVIEW,
+        Param('curve', 'str', None, ['linear', 'squared', 'smoothstep', 'solid']),
+        Param('layers', 'json', None),
+        Param('hills', 'bool', False),
+        Param('clouds', 'number', 0, minimum=0, maximum=1),
+    ), check=check_horizon1),
+}
+
+def lookup(name):
+    if name not in GENERATORS:
+        raise ValueError('unknown generator {!r}, expected one of {}'.format(
+            name, ', '.join(sorted(GENERATORS))
+        ))
+    return GENERATORS[name]
+
+def check_value(param, value):
+    """
+    Raises ValueError unless value is acceptable for param.
+    """
+    if value is None:
+        if param.default is None:
+            return
+    elif isinstance(value, TYPES[param.kind]) and not (
+        isinstance(value, bool) and param.kind in ('int', 'number')
+    ):
+        if param.choices is not None and value not in param.choices:
+            raise ValueError('{} must be one of {}, got {!r}'.format(
+                param.name, ', '.join(param.choices), value
+            ))
+        if param.kind == 'number' and not math.isfinite(value):
+            raise ValueError('{} must be finite, got {!r}'.format(param.name, value))
+        if param.minimum is not None and value < param.minimum:
+            raise ValueError('{} must be at least {}, got {!r}'.format(
+                param.name, param.minimum, value
+            ))
+        if param.maximum is not None and value > param.maximum:
+            raise ValueError('{} must be at most {}, got {!r}'.format(
+                param.name, param.maximum, value
+            ))
+        return
+    raise ValueError('{} must be a {} value, got {!r}'.format(
+        param.name, param.kind, value
+    ))
+
+def validate(name, params):
+    """
+    Raises ValueError unless params (a dict) are valid parameters for
+    generator name, without importing it.
+    """
+    generator = lookup(name)
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object, got {!r}'.format(params))
+    specs = {param.name: param for param in generator.params}
+    for (key, value) in params.items():
+        if key not in specs:
+            raise ValueError('unknown parameter {!r} for {}, expected one of {}'.format(
+                key, name, ', '.join(specs)
+            ))
+        check_value(specs[key], value)
+    if generator.check is not None:
+        defaults = {param.name: param.default for param in generator.params}
+        generator.check(dict(defaults, **params))
+
+def load(name):
+    """
+    Imports (or returns the already imported) module for generator name.
+    """
+    generator = lookup(name)
+    path = os.path.join(ROOT, generator.directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return importlib.import_module(generator.module)
+
+def render(name, file_name, cache=None, **params):
+    """
+    Renders generator name to file_name, passing params through to its entry
+    point.
+    cache is a rendercache.Cache, used by the generators that can.
+
+    With GENERATIVE_PROFILE=<prefix> set, the render is profiled by stage and
+    the results saved as <prefix>-<name>-<timestamp>.json (see instrument.py).
+    """
+    arguments = dict(params)
+    if cache is not None and lookup(name).cacheable:
+        arguments['cache'] = cache
+
+    prefix = os.environ.get(PROFILE_ENV_VAR)
+    if not prefix:
+        getattr(load(name), lookup(name).function)(file_name=file_name, **arguments)
+        return
+
+    # instrument imports this module
+    import instrument
+    recorder = instrument.profile(name, file_name, **arguments)
+    recorder.save(
+        '{}-{}-{}'.format(prefix, name, int(time.time() * 1000)),
+        generator=name, params=params
+    )
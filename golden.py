@@ -0,0 +1,226 @@
+"""
+Golden output harness.  Renders each case below with a fixed seed and
+compares it with the reference recorded in golden/, so optimized render paths
+can be checked against the output of the code they replace.
+
+    python3 golden.py check [case ...]
+    python3 golden.py update [case ...]
+
+For PNG outputs the reference is a hash of the decoded pixels plus a
+downsampled copy of the image (golden/<case>.png); outputs whose hash differs
+pass if their downsampled pixels are within a tolerance of the reference.
+For SVG outputs the reference is the file itself, gzipped; outputs pass if
+they only differ in their numbers, by at most a tolerance.  Render times are
+reported against the time recorded with the reference.
+"""
+import argparse
+import collections
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import generators
+
+GOLDEN_DIR = os.path.join(generators.ROOT, 'golden')
+MANIFEST = 'manifest.json'
+
+# block size for the downsampled reference images
+DOWNSAMPLE = 4
+
+Case = collections.namedtuple('Case', ['generator', 'params'])
+
+CASES = {
+    'aphex': Case('aphex', {'seed': 1}),
+    'aphex-compact': Case('aphex', {'seed': 1, 'precision': 2, 'construction': False}),
+    'sl': Case('sl', {'scale': 40, 'seed': 1}),
+    'horizon1': Case('horizon1', {'width': 320, 'height': 180, 'seed': 1}),
+}
+
+Result = collections.namedtuple(
+    'Result', ['name', 'passed', 'exact', 'difference', 'seconds', 'reference_seconds']
+)
+
+NUMBER = re.compile(r'-?(\d+\.?\d*|\.\d+)(e-?\d+)?')
+
+def render_case(case, directory, repeat=1):
+    """
+    Renders case into directory, repeat times, returning the output path and
+    the fastest render time.
+    """
+    extension = generators.lookup(case.generator).extension
+    path = os.path.join(directory, 'output' + extension)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generators.render(case.generator, path, **case.params)
+        times.append(time.perf_counter() - start)
+
+    return (path, min(times))
+
+def load_pixels(path):
+    return np.asarray(Image.open(path).convert('RGB'))
+
+def pixel_hash(pixels):
+    h = hashlib.sha256()
+    h.update(str(pixels.shape).encode())
+    h.update(np.ascontiguousarray(pixels, dtype=np.uint8).tobytes())
+    return h.hexdigest()
+
+def text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def downsample(pixels, block=DOWNSAMPLE):
+    """
+    Averages pixels over block x block squares, dropping any partial blocks
+    at the right and bottom edges.
+    """
+    (height, width, depth) = pixels.shape
+    (h, w) = (height // block, width // block)
+    blocks = pixels[:h * block, :w * block].reshape(h, block, w, block, depth)
+    return np.uint8(np.round(blocks.mean(axis=(1, 3))))
+
+def pixel_difference(pixels, reference):
+    """
+    Largest per-channel difference between two downsampled images, or None
+    if their shapes differ.
+    """
+    if pixels.shape != reference.shape:
+        return None
+    return int(np.abs(pixels.astype(int) - reference.astype(int)).max())
+
+def number_difference(text, reference):
+    """
+    Largest difference between the numbers of two texts that are otherwise
+    the same, or None if they differ in anything but their numbers.
+    """
+    if NUMBER.sub('#', text) != NUMBER.sub('#', reference):
+        return None
+    numbers = [float(m.group()) for m in NUMBER.finditer(text)]
+    reference_numbers = [float(m.group()) for m in NUMBER.finditer(reference)]
+    return max(
+        [abs(a - b) for (a, b) in zip(numbers, reference_numbers)],
+        default=0
+    )
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def update(names=None, directory=GOLDEN_DIR, repeat=3):
+    """
+    Records new references for the named cases (all of them by default).
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    for name in names or sorted(CASES):
+        case = CASES[name]
+        with tempfile.TemporaryDirectory() as scratch:
+            (path, seconds) = render_case(case, scratch, repeat)
+            entry = {
+                'generator': case.generator,
+                'params': case.params,
+                'seconds': seconds,
+            }
+            if path.endswith('.svg'):
+                with open(path) as f:
+                    text = f.read()
+                entry['hash'] = text_hash(text)
+                with gzip.open(os.path.join(directory, name + '.svg.gz'), 'wt') as f:
+                    f.write(text)
+            else:
+                pixels = load_pixels(path)
+                entry['hash'] = pixel_hash(pixels)
+                entry['shape'] = list(pixels.shape)
+                Image.fromarray(downsample(pixels)).save(
+                    os.path.join(directory, name + '.png')
+                )
+        manifest[name] = entry
+
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def check(names=None, directory=GOLDEN_DIR, repeat=1,
+        pixel_tolerance=2, number_tolerance=1e-9):
+    """
+    Renders the named cases (all of them by default) and compares them with
+    their references, returning a Result for each.  pixel_tolerance is in
+    0-255 levels of the downsampled images.
+    """
+    manifest = load_manifest(directory)
+    results = []
+    for name in names or sorted(CASES):
+        entry = manifest[name]
+        with tempfile.TemporaryDirectory() as scratch:
+            (path, seconds) = render_case(CASES[name], scratch, repeat)
+            if path.endswith('.svg'):
+                with open(path) as f:
+                    text = f.read()
+                exact = text_hash(text) == entry['hash']
+                if exact:
+                    difference = 0
+                else:
+                    with gzip.open(os.path.join(directory, name + '.svg.gz'), 'rt') as f:
+                        difference = number_difference(text, f.read())
+                tolerance = number_tolerance
+            else:
+                pixels = load_pixels(path)
+                exact = pixel_hash(pixels) == entry['hash']
+                if exact:
+                    difference = 0
+                else:
+                    reference = load_pixels(os.path.join(directory, name + '.png'))
+                    difference = pixel_difference(downsample(pixels), reference)
+                tolerance = pixel_tolerance
+
+        passed = difference is not None and difference <= tolerance
+        results.append(Result(
+            name, passed, exact, difference, seconds, entry['seconds']
+        ))
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Golden output harness.')
+    parser.add_argument('command', choices=['check', 'update'])
+    parser.add_argument('cases', nargs='*', choices=[[]] + sorted(CASES),
+        help='defaults to all cases')
+    parser.add_argument('--repeat', type=int, default=3,
+        help='render each case this many times and keep the fastest')
+    parser.add_argument('--pixel-tolerance', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        update(args.cases, repeat=args.repeat)
+        return
+
+    results = check(
+        args.cases, repeat=args.repeat, pixel_tolerance=args.pixel_tolerance
+    )
+    for r in results:
+        if r.exact:
+            status = 'exact'
+        elif r.passed:
+            status = 'within tolerance ({})'.format(r.difference)
+        elif r.difference is None:
+            status = 'FAILED (structure or size changed)'
+        else:
+            status = 'FAILED (difference {})'.format(r.difference)
+        print('{:<16} {:<36} {:.3f} s ({:.2f}x reference)'.format(
+            r.name, status, r.seconds, r.seconds / r.reference_seconds
+        ))
+
+    if not all(r.passed for r in results):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
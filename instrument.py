@@ -0,0 +1,189 @@
+"""
+Per-stage timing and memory instrumentation for the generators.
+
+Each generator module lists its pipeline stages (function names) in STAGES.
+While instrumented, every call to a stage records its wall time, and with
+memory tracking on, the peak memory traced by tracemalloc while it ran.
+Stages nest: a stage's time and peak include the stages it calls.
+
+    python3 instrument.py sl '{"scale": 85, "seed": 1}' --out sl-profile
+    python3 instrument.py sl '{"scale": 85, "seed": 1}' --compare sl-profile.json
+
+writes sl-profile.json (a summary per stage) and sl-profile.trace.json (a
+Chrome trace, viewable in chrome://tracing or Perfetto).  Setting
+GENERATIVE_PROFILE=<prefix> profiles every generators.render() call, e.g. in
+renderd.py, the same way.
+"""
+import argparse
+import collections
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+import generators
+
+class Recorder:
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.start = time.perf_counter()
+        self.calls = collections.Counter()
+        self.wall = collections.Counter()
+        self.peak = collections.Counter()
+        self.events = []
+        # [start bytes, peak bytes so far] for each stage currently running
+        self.frames = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.memory:
+            self.enter_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.calls[name] += 1
+            self.wall[name] += end - start
+            self.events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self.start) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': 0,
+            })
+            if self.memory:
+                peak = self.exit_memory()
+                self.peak[name] = max(self.peak[name], peak)
+                self.events[-1]['args'] = {'peak_bytes': peak}
+
+    def enter_memory(self):
+        # tracemalloc only keeps one peak, so fold the running one into the
+        # enclosing stage before resetting it for this one
+        (current, peak) = tracemalloc.get_traced_memory()
+        if self.frames:
+            self.frames[-1][1] = max(self.frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        self.frames.append([current, current])
+
+    def exit_memory(self):
+        (_, peak) = tracemalloc.get_traced_memory()
+        (start, frame_peak) = self.frames.pop()
+        frame_peak = max(frame_peak, peak)
+        if self.frames:
+            self.frames[-1][1] = max(self.frames[-1][1], frame_peak)
+        return frame_peak - start
+
+    def wrap(self, fn, name):
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return wrapped
+
+    def summary(self):
+        return {
+            name: {
+                'calls': self.calls[name],
+                'wall_s': self.wall[name],
+                'peak_bytes': self.peak[name] if self.memory else None,
+            }
+            for name in self.calls
+        }
+
+    def trace(self):
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms'}
+
+    def save(self, prefix, **info):
+        """
+        Writes prefix.json and prefix.trace.json.  info is stored alongside
+        the stage summary, e.g. which generator and parameters were run.
+        """
+        with open(prefix + '.json', 'w') as f:
+            json.dump(dict(info, stages=self.summary()), f, indent=2)
+        with open(prefix + '.trace.json', 'w') as f:
+            json.dump(self.trace(), f)
+
+@contextlib.contextmanager
+def instrumented(module, recorder):
+    """
+    Replaces each of module's STAGES with a recording wrapper for the
+    duration of the block.  Stages call each other through the module's
+    globals, so nested calls are recorded too.
+    """
+    originals = {name: getattr(module, name) for name in module.STAGES}
+    started = recorder.memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for (name, fn) in originals.items():
+            setattr(module, name, recorder.wrap(fn, name))
+        yield recorder
+    finally:
+        for (name, fn) in originals.items():
+            setattr(module, name, fn)
+        if started:
+            tracemalloc.stop()
+
+def profile(name, file_name, memory=True, **params):
+    """
+    Renders generator name like generators.render() and returns the Recorder
+    with its stage measurements.
+    """
+    module = generators.load(name)
+    recorder = Recorder(memory)
+    with instrumented(module, recorder):
+        getattr(module, generators.lookup(name).function)(
+            file_name=file_name, **params
+        )
+    return recorder
+
+def compare(baseline, summary):
+    """
+    Lines comparing each stage's wall time in summary against a baseline
+    summary, both as returned by Recorder.summary().
+    """
+    lines = []
+    for (name, stats) in sorted(summary.items(), key=lambda s: -s[1]['wall_s']):
+        line = '{:<20} {:>6} calls {:>10.4f} s'.format(
+            name, stats['calls'], stats['wall_s']
+        )
+        if name in baseline and baseline[name]['wall_s'] > 0:
+            line += ' {:+.0%}'.format(stats['wall_s'] / baseline[name]['wall_s'] - 1)
+        lines.append(line)
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile a generator by stage.')
+    parser.add_argument('generator', choices=sorted(generators.GENERATORS))
+    parser.add_argument('params', nargs='?', default='{}',
+        help='JSON object of parameters for the generator')
+    parser.add_argument('-o', '--output', help='rendered file')
+    parser.add_argument('--out', help='prefix for the profile files')
+    parser.add_argument('--compare', help='profile .json to compare against')
+    parser.add_argument('--no-memory', action='store_true',
+        help='skip tracemalloc, which slows rendering down considerably')
+    args = parser.parse_args()
+
+    params = json.loads(args.params)
+    extension = generators.lookup(args.generator).extension
+    recorder = profile(
+        args.generator, args.output or args.generator + extension,
+        memory=not args.no_memory, **params
+    )
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['stages']
+    for line in compare(baseline, recorder.summary()):
+        print(line)
+
+    prefix = args.out or os.environ.get(generators.PROFILE_ENV_VAR) or args.generator + '-profile'
+    recorder.save(prefix, generator=args.generator, params=params)
+
+if __name__ == '__main__':
+    main()
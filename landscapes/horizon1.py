@@ -1,10 +1,38 @@
+import collections
+import functools
+import math
+import os
 import random
 
 import numpy as np
 from PIL import Image
 
-WIDTH = int(16 * 100 * .6)
-HEIGHT = int(9 * 100 * .6)
+# 16:9
+WIDTH = 960
+HEIGHT = 540
+
+# pipeline stages, for instrument.py
+STAGES = ['main', 'draw_horizons', 'composite', 'init_solid', 'horizon_scaling',
+    'smooth_rands', 'fractal_noise', 'gradient', 'noise', 'save_image']
+
+NORMAL = 'normal'
+MULTIPLY = 'multiply'
+SCREEN = 'screen'
+ADD = 'add'
+
+# A horizon fading from base to rgb over the rows from top to bottom (as
+# fractions of the canvas height).  cutoffs is the horizon line, as from
+# smooth_rands: where in the band the fade starts, per column.  flip fades
+# upward instead.  curve eases the fade, see main().  blend is how the layer
+# combines with the layers below it, with opacity.
+Layer = collections.namedtuple(
+    'Layer',
+    ['base', 'rgb', 'top', 'bottom', 'cutoffs', 'flip', 'curve', 'blend', 'opacity'],
+    defaults=[None, False, None, NORMAL, 1]
+)
+
+# rows per band in composite
+BAND = 64
 
 
 def init_solid(width, height, rgb):
@@ -45,6 +73,52 @@ def color_scale(cur, total, proportion):
     else:
         return 0
 
+# entries in a tone curve lookup table
+LUT_SIZE = 4096
+
+def power_curve(exponent):
+    return lambda x: x ** exponent
+
+def smoothstep(x):
+    return x * x * (3 - 2 * x)
+
+def piecewise_curve(points):
+    """
+    Curve through (x, y) points, linear in between.  xs must increase.
+    """
+    (xs, ys) = zip(*points)
+    return lambda x: np.interp(x, xs, ys)
+
+def solid_curve(proportion, exponent=2):
+    """
+    Like color_scale: flat for the first proportion of the range, then eased
+    in by exponent.
+    """
+    return lambda x: (np.maximum(x - proportion, 0) / (1 - proportion)) ** exponent
+
+TONE_CURVES = {
+    'linear': power_curve(1),
+    'squared': power_curve(2),
+    'smoothstep': smoothstep,
+    'solid': solid_curve(.85),
+}
+
+def tone_lut(curve, size=LUT_SIZE):
+    """
+    Samples curve, a function from [0, 1] onto [0, 1] that works on arrays,
+    into a lookup table for apply_tone.
+    """
+    return np.asarray(curve(np.linspace(0, 1, size)), dtype=float)
+
+def apply_tone(lut, scaling):
+    """
+    Maps each value of scaling (in [0, 1]) through the curve sampled in lut.
+    The cost is one table lookup per value whatever the curve.
+    """
+    indexes = scaling * (len(lut) - 1)
+    np.rint(indexes, out=indexes)
+    return np.take(lut, indexes.astype(np.intp), mode='clip')
+
 def smooth_rands(n, low, high, variation, seed=None):
     """
     Return a sequence of n values, low <= value < high where the difference
@@ -68,42 +142,304 @@ def smooth_rands(n, low, high, variation, seed=None):
 
     return np.array(rands)
 
-def horizon_scaling(shape):
+def resample(a, length):
+    """
+    Stretches or shrinks 1-D array a to length values by nearest neighbor
+    sampling.
+    """
+    if len(a) == length:
+        return a
+    return a[np.arange(length) * len(a) // length]
+
+def fade(t):
+    # smootherstep: zero first and second derivatives at the lattice points
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+def lattice_weights(length, period):
+    """
+    For each of length pixels, the index of the lattice point before it and
+    the faded weight of the one after it.
+    """
+    position = np.arange(length) / period
+    index = position.astype(np.intp)
+    return (index, fade(position - index).astype(np.float32))
+
+def value_noise(width, height, period, rng):
+    """
+    One octave of value noise: random values on a lattice every period
+    pixels (a number, or an (x, y) pair), smoothly interpolated between.
+    Interpolation is separable, so it is done along x for just the lattice
+    rows first and then along y for every pixel at once.
+    """
+    (period_x, period_y) = period if isinstance(period, tuple) else (period, period)
+    lattice = rng.rand(int(height / period_y) + 2, int(width / period_x) + 2)
+    lattice = lattice.astype(np.float32)
+
+    (x, tx) = lattice_weights(width, period_x)
+    rows = lattice[:, x]
+    rows += (lattice[:, x + 1] - rows) * tx
+
+    (y, ty) = lattice_weights(height, period_y)
+    field = rows[y]
+    field += (rows[y + 1] - field) * ty[:, np.newaxis]
+    return field
+
+def fractal_noise(width, height, period, octaves=4, persistence=.5,
+        lacunarity=2, seed=None):
+    """
+    Coherent noise in [0, 1]: octaves of value_noise, each lacunarity times
+    finer and persistence times weaker than the one before.  seed makes it
+    repeatable without touching the global random state.
+    """
+    rng = np.random.RandomState(seed)
+    (period_x, period_y) = period if isinstance(period, tuple) else (period, period)
+
+    field = np.zeros((height, width), dtype=np.float32)
+    amplitude = 1
+    total = 0
+    for octave in range(octaves):
+        field += amplitude * value_noise(width, height, (period_x, period_y), rng)
+        total += amplitude
+        amplitude *= persistence
+        period_x = max(period_x / lacunarity, 1)
+        period_y = max(period_y / lacunarity, 1)
+
+    field /= total
+    return field
+
+def noise_cutoffs(n, low, high, period, octaves=4, seed=None):
+    """
+    A horizon line like smooth_rands makes, from fractal_noise: n values from
+    low to high that roll like hills.
+    """
+    line = fractal_noise(n, 1, period, octaves, seed=seed)[0]
+    return low + line.astype(float) * (high - low)
+
+def horizon_scaling(shape, seed=None, rands=None):
+    """
+    rands are the cutoffs from smooth_rands, when they have already been made
+    (possibly for another width).
+    """
     (height, width, depth) = shape
 
     # make random cutoffs
-    rands = smooth_rands(width, .80, .85, .01)
+    if rands is None:
+        rands = smooth_rands(width, .80, .85, .01, seed)
+    else:
+        rands = resample(rands, width)
     cutoff = np.tile(rands, height).reshape(height, width)
 
     # smooth gradient indexes
     cur = np.repeat(np.arange(height), width).reshape(height, width)
     cur = cur/cur.max()
-    total = np.ones((height, width))
 
     # ignore inactive ones
     inactive = cur < cutoff
     cur[inactive] = cutoff[inactive]
 
-    # create the scaling
-    return ((cur - cutoff) ** 1) / ((total - cutoff) ** 1)
+    # create the scaling, see apply_tone for easing it
+    return (cur - cutoff) / (1 - cutoff)
+
+def draw_horizons(width, height, base, rgb, cutoffs, cache=None, lut=None):
+    """
+    Mirrored pair of horizons fading from base to rgb.  cutoffs holds the top
+    and bottom horizon lines from smooth_rands, resampled to width as needed.
+    lut is a tone_lut to ease the fades with.
+    """
+    (top_rands, bottom_rands) = cutoffs
 
-def main():
+    solid = init_solid(width, height, base)
+
+    (top, bottom) = np.array_split(solid, 2)
+
+    scaling = horizon_scaling
+    if cache is not None:
+        # with rands given, horizon_scaling doesn't draw random numbers
+        scaling = functools.partial(cache.call, horizon_scaling, uses_random=False)
+    top_scaling = scaling(top.shape, None, top_rands)
+    bottom_scaling = scaling(bottom.shape, None, bottom_rands)
+    if lut is not None:
+        top_scaling = apply_tone(lut, top_scaling)
+        bottom_scaling = apply_tone(lut, bottom_scaling)
+
+    gradient_top = gradient(top, rgb, top_scaling)
+    gradient_bottom = gradient(bottom, rgb, bottom_scaling)
+    gradient_bottom_flipped = np.flipud(gradient_bottom)
+    return np.concatenate((gradient_top, gradient_bottom_flipped))
+
+def band_row(fraction, height):
+    # round halves up so bands split odd heights like np.array_split
+    return math.floor(fraction * height + .5)
+
+def layer_scaling(layer, start, stop, width, height):
+    """
+    Scaling for rows start to stop of layer (in canvas rows), computed like
+    horizon_scaling but for just those rows.
+    """
+    top = band_row(layer.top, height)
+    rows = band_row(layer.bottom, height) - top
+
+    cur = np.arange(start - top, stop - top)
+    if layer.flip:
+        cur = (rows - 1) - cur
+    # a one row band is all at the top of its fade
+    cur = cur / max(rows - 1, 1)
+
+    cutoff = resample(np.asarray(layer.cutoffs), width)
+    cur = np.maximum(cur[:, np.newaxis], cutoff)
+    return (cur - cutoff) / (1 - cutoff)
+
+def blend(below, color, mode, opacity):
+    """
+    Blends color over below, in place.
+    """
+    if mode == MULTIPLY:
+        color = below * color / 255
+    elif mode == SCREEN:
+        color = 255 - (255 - below) * (255 - color) / 255
+    elif mode == ADD:
+        color = np.minimum(below + color, 255)
+    elif mode != NORMAL:
+        raise ValueError('unknown blend mode {!r}'.format(mode))
+
+    if opacity == 1:
+        below[...] = color
+    else:
+        below += opacity * (color - below)
+
+def composite(width, height, layers, background=(0, 0, 0)):
+    """
+    Draws layers, bottom first, into a single canvas.  The canvas is filled a
+    band of rows at a time with every layer that covers the band, so the only
+    temporaries are band sized however many layers there are.
+    """
+    canvas = np.empty((height, width, 3))
+    canvas[...] = background
+
+    luts = [
+        None if layer.curve is None else tone_lut(
+            TONE_CURVES[layer.curve] if isinstance(layer.curve, str) else layer.curve
+        )
+        for layer in layers
+    ]
+
+    # layers can round to no rows at all at small sizes, e.g. for previews
+    drawn = [
+        (layer, lut, band_row(layer.top, height), band_row(layer.bottom, height))
+        for (layer, lut) in zip(layers, luts)
+        if band_row(layer.bottom, height) > band_row(layer.top, height)
+    ]
+
+    for band_start in range(0, height, BAND):
+        band_stop = min(band_start + BAND, height)
+        for (layer, lut, top, bottom) in drawn:
+            start = max(band_start, top)
+            stop = min(band_stop, bottom)
+            if start >= stop:
+                continue
+
+            scaling = layer_scaling(layer, start, stop, width, height)
+            if lut is not None:
+                scaling = apply_tone(lut, scaling)
+
+            base = np.asarray(layer.base)
+            color = base + scaling[..., np.newaxis] * (np.asarray(layer.rgb) - base)
+            blend(canvas[start:stop], color, layer.blend, layer.opacity)
+
+    return canvas
+
+def horizon_layers(base, rgb, cutoffs, curve=None):
+    """
+    The layers for the mirrored pair of horizons that draw_horizons draws.
+    """
+    (top_rands, bottom_rands) = cutoffs
+    return [
+        Layer(base, rgb, 0, .5, top_rands, curve=curve),
+        Layer(base, rgb, .5, 1, bottom_rands, flip=True, curve=curve),
+    ]
+
+def preview_file_name(file_name):
+    (root, extension) = os.path.splitext(file_name)
+    return root + '.preview' + extension
+
+def main(file_name='horizon1.png', width=WIDTH, height=HEIGHT, seed=None,
+        preview=None, cache=None, curve=None, layers=None, hills=False, clouds=0):
+    """
+    seed makes the render repeatable; the top and bottom horizons get seed and
+    seed + 1 so they still differ from each other.
+
+    With preview, first saves a copy at 1/preview of the size next to
+    file_name (horizon1.png -> horizon1.preview.png), drawn from the same
+    horizon lines as the full size image.  The preview skips the noise so the
+    full size image gets the same noise it would have without a preview.
+
+    cache (a rendercache.Cache) reuses the horizons' scaling fields when the
+    seed and size match an earlier render, e.g. one with other colors.  It is
+    ignored without a seed.
+
+    curve eases the fades: a name from TONE_CURVES or a function of an array
+    in [0, 1] (see tone_lut).  The default is linear.
+
+    layers replaces the pair of horizons with a stack of Layers (or dicts of
+    Layer fields) drawn by composite; each layer has its own curve.  cache
+    isn't used for layers, which composite draws a band at a time.  Layers
+    without cutoffs get their own horizon lines, seeded with seed + 2,
+    seed + 3, ...
+
+    hills makes all the horizon lines, layers' included, with noise_cutoffs
+    instead of smooth_rands.
+    clouds blends that much (0 to 1) of a horizontally stretched
+    fractal_noise field toward the horizon color, for banding.
+    """
     blue = (75, 0, 130)
     yellow = (148, 0, 211)
 
-    solid = init_solid(WIDTH, HEIGHT, blue)
+    np.random.seed(seed)
+    bottom_seed = None if seed is None else seed + 1
+    if seed is None:
+        cache = None
 
-    (top, bottom) = np.split(solid, 2)
+    lut = None
+    if curve is not None:
+        lut = tone_lut(TONE_CURVES[curve] if isinstance(curve, str) else curve)
 
-    top_scaling = horizon_scaling(top.shape)
-    bottom_scaling = horizon_scaling(bottom.shape)
+    def horizon_line(seed):
+        if hills:
+            return noise_cutoffs(width, .70, .90, width / 4, seed=seed)
+        return smooth_rands(width, .80, .85, .01, seed)
 
-    gradient_top = gradient(top, yellow, top_scaling)
-    gradient_bottom = gradient(bottom, yellow, bottom_scaling)
-    gradient_bottom_flipped = np.flipud(gradient_bottom)
-    g = np.concatenate((gradient_top, gradient_bottom_flipped))
+    cutoffs = (horizon_line(seed), horizon_line(bottom_seed))
+
+    if layers is None:
+        def draw(width, height):
+            return draw_horizons(width, height, blue, yellow, cutoffs, cache, lut)
+    else:
+        layers = [
+            layer if isinstance(layer, Layer) else Layer(**layer)
+            for layer in layers
+        ]
+        layers = [
+            layer._replace(cutoffs=horizon_line(
+                None if seed is None else seed + 2 + i
+            )) if layer.cutoffs is None else layer
+            for (i, layer) in enumerate(layers)
+        ]
+        def draw(width, height):
+            return composite(width, height, layers)
+
+    if clouds:
+        draw_layers = draw
+        def draw(width, height):
+            field = fractal_noise(width, height, (width / 2, height / 16),
+                seed=None if seed is None else seed + 1000)
+            return gradient(draw_layers(width, height), yellow, field * clouds)
+
+    if preview:
+        save_image(preview_file_name(file_name), draw(width // preview, height // preview))
+
+    g = draw(width, height)
     g_noise = noise(g, 1)
-    save_image('horizon1.png', g_noise)
+    save_image(file_name, g_noise)
 
 if __name__== "__main__":
     main()
@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 import numpy as np
+from PIL import Image
 
 import horizon1
 
@@ -19,5 +23,148 @@ class Horizon1Test(unittest.TestCase):
             1.583728, 1.27739, 1.343398, 1.005086, 0.629353])
         np.testing.assert_allclose(result, expected, rtol=1e-05)
 
+    def test_resample(self):
+        a = np.array([0, 1, 2, 3])
+        np.testing.assert_equal(horizon1.resample(a, 2), [0, 2])
+        np.testing.assert_equal(horizon1.resample(a, 6), [0, 0, 1, 2, 2, 3])
+
+    def test_preview(self):
+        with tempfile.TemporaryDirectory() as directory:
+            progressive = os.path.join(directory, 'progressive.png')
+            direct = os.path.join(directory, 'direct.png')
+            horizon1.main(progressive, 96, 54, seed=3, preview=4)
+            horizon1.main(direct, 96, 54, seed=3)
+
+            preview = Image.open(horizon1.preview_file_name(progressive))
+            self.assertEqual(preview.size, (24, 13))
+            np.testing.assert_equal(
+                np.asarray(Image.open(progressive)),
+                np.asarray(Image.open(direct))
+            )
+
+    def test_tone_lut(self):
+        x = np.random.RandomState(0).rand(50, 40)
+        for curve in [horizon1.power_curve(2), horizon1.smoothstep,
+                horizon1.solid_curve(.5)]:
+            lut = horizon1.tone_lut(curve)
+            # these curves increase, so each x lies between two neighbouring
+            # entries and the lookup returns one of them
+            np.testing.assert_allclose(
+                horizon1.apply_tone(lut, x.copy()), curve(x),
+                atol=np.diff(lut).max()
+            )
+
+    def test_piecewise_curve(self):
+        curve = horizon1.piecewise_curve([(0, 0), (.5, .1), (1, 1)])
+        lut = horizon1.tone_lut(curve, 11)
+        result = horizon1.apply_tone(lut, np.array([0, .3, .5, 1]))
+        np.testing.assert_allclose(result, [0, .06, .1, 1])
+
+    def test_apply_tone_leaves_scaling(self):
+        scaling = np.array([0, .5, 1])
+        horizon1.apply_tone(horizon1.tone_lut(horizon1.smoothstep), scaling)
+        np.testing.assert_equal(scaling, [0, .5, 1])
+
+    def test_composite_matches_draw_horizons(self):
+        cutoffs = (
+            horizon1.smooth_rands(40, .8, .85, .01, 1),
+            horizon1.smooth_rands(40, .8, .85, .01, 2),
+        )
+        for (height, curve) in [(30, None), (31, 'smoothstep')]:
+            lut = None if curve is None else horizon1.tone_lut(horizon1.TONE_CURVES[curve])
+            expected = horizon1.draw_horizons(40, height, (75, 0, 130),
+                (148, 0, 211), cutoffs, lut=lut)
+            layers = horizon1.horizon_layers((75, 0, 130), (148, 0, 211),
+                cutoffs, curve)
+            result = horizon1.composite(40, height, layers)
+            np.testing.assert_equal(result, expected)
+
+    def test_composite_bands(self):
+        layers = [
+            horizon1.Layer((0, 0, 0), (255, 255, 255), 0, 1, np.full(8, .2)),
+            horizon1.Layer((255, 0, 0), (0, 0, 255), .25, .75, np.full(8, .5),
+                flip=True, blend=horizon1.SCREEN, opacity=.5),
+        ]
+        expected = horizon1.composite(8, 100, layers)
+        band = horizon1.BAND
+        try:
+            horizon1.BAND = 7
+            result = horizon1.composite(8, 100, layers)
+        finally:
+            horizon1.BAND = band
+        np.testing.assert_equal(result, expected)
+
+    def test_composite_tiny_bands(self):
+        # at height 2 the second layer has one row, and at height 1 none
+        layers = [
+            horizon1.Layer((0, 0, 0), (255, 255, 255), 0, 1, np.full(8, .2)),
+            horizon1.Layer((255, 0, 0), (0, 0, 255), .25, .75, np.full(8, .5),
+                flip=True),
+        ]
+        with np.errstate(all='raise'):
+            for height in (2, 1):
+                result = horizon1.composite(8, height, layers)
+                self.assertEqual(result.shape, (height, 8, 3))
+                self.assertTrue(np.isfinite(result).all())
+
+    def test_blend(self):
+        below = np.array([[100., 200., 0.]])
+        color = np.array([[255., 100., 50.]])
+        tests = [
+            (horizon1.NORMAL, 1, [255, 100, 50]),
+            (horizon1.NORMAL, .5, [177.5, 150, 25]),
+            (horizon1.MULTIPLY, 1, [100, 200 * 100 / 255, 0]),
+            (horizon1.SCREEN, 1, [255, 255 - 55 * 155 / 255, 50]),
+            (horizon1.ADD, 1, [255, 255, 50]),
+        ]
+        for (mode, opacity, expected) in tests:
+            result = below.copy()
+            horizon1.blend(result, color, mode, opacity)
+            np.testing.assert_allclose(result, [expected])
+
+    def test_main_layers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'layers.png')
+            horizon1.main(path, 48, 27, seed=1, layers=[
+                {'base': (0, 0, 0), 'rgb': (0, 0, 255), 'top': 0, 'bottom': 1},
+                {'base': (0, 0, 0), 'rgb': (255, 128, 0), 'top': .5, 'bottom': 1,
+                    'flip': True, 'blend': 'add', 'curve': 'squared'},
+            ])
+            self.assertEqual(Image.open(path).size, (48, 27))
+
+    def test_main_layers_hills(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hills.png')
+            with mock.patch.object(horizon1, 'composite', wraps=horizon1.composite) as composite:
+                horizon1.main(path, 48, 27, seed=1, hills=True, layers=[
+                    {'base': (0, 0, 0), 'rgb': (0, 0, 255), 'top': 0, 'bottom': 1},
+                ])
+            (layer,) = composite.call_args[0][2]
+            np.testing.assert_equal(
+                layer.cutoffs, horizon1.noise_cutoffs(48, .7, .9, 12, seed=3)
+            )
+
+    def test_fractal_noise(self):
+        field = horizon1.fractal_noise(200, 100, 50, seed=3)
+        self.assertEqual(field.shape, (100, 200))
+        self.assertGreaterEqual(field.min(), 0)
+        self.assertLessEqual(field.max(), 1)
+        np.testing.assert_equal(field, horizon1.fractal_noise(200, 100, 50, seed=3))
+        self.assertFalse(np.array_equal(field, horizon1.fractal_noise(200, 100, 50, seed=4)))
+
+    def test_value_noise_is_coherent(self):
+        rng = np.random.RandomState(0)
+        field = horizon1.value_noise(300, 200, (60, 40), rng)
+        # neighboring pixels are close, far apart ones need not be
+        self.assertLess(np.abs(np.diff(field, axis=0)).max(), .1)
+        self.assertLess(np.abs(np.diff(field, axis=1)).max(), .1)
+        self.assertGreater(field.max() - field.min(), .3)
+
+    def test_noise_cutoffs(self):
+        cutoffs = horizon1.noise_cutoffs(500, .7, .9, 100, seed=1)
+        self.assertEqual(cutoffs.shape, (500,))
+        self.assertGreaterEqual(cutoffs.min(), .7)
+        self.assertLessEqual(cutoffs.max(), .9)
+
 if __name__ == '__main__':
     unittest.main()
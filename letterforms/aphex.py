@@ -1,9 +1,11 @@
 import collections
+import hashlib
+import json
 import math
 import random
-import unittest
 
-import svgwrite
+# svgwrite is imported by the functions that draw, so the geometry (used by
+# plotter.py, for instance) and command line tools load without it
 
 Circle = collections.namedtuple('Circle', ['x', 'y', 'r'])
 Segment = collections.namedtuple('Segment', ['x0', 'y0', 'x1', 'y1'])
@@ -16,6 +18,13 @@ CYLINDRICAL = 'cylindrical'
 LUMPY = 'lumpy'
 ARM_TYPES = [SIMPLE, CYLINDRICAL, LUMPY]
 
+# pipeline stages, for instrument.py
+STAGES = ['main', 'render_incremental', 'cell_fragment', 'arm_circles',
+    'draw_path', 'path_segments', 'tangent', 'arc', 'compact_path']
+
+# cell size on the sheet
+SCALING = 200
+
 def mag_v(v):
     return math.sqrt(v[0]**2 + v[1]**2)
 
@@ -200,16 +209,72 @@ def arc_svg(a):
 def tangent_svg(t):
     return 'L {x1} {y1}'.format(**t._asdict())
 
-def draw_path(circles, sides):
+def format_number(x, precision):
     """
-    Takes a list of N Circle objects and a list of N side constants (LEFT or
-    RIGHT) and generates a path that traverses the circles as though it were a
-    piece of string wrapped around them. The sides list determines which side of
-    each circle the path passes by.
+    Formats x with at most precision decimal places and no redundant
+    characters: trailing zeros and leading zeros before the point are dropped.
+    """
+    s = '{:.{}f}'.format(x, precision)
+    if '.' in s:
+        s = s.rstrip('0').rstrip('.')
+    if s == '-0':
+        s = '0'
+    if s.startswith('0.'):
+        s = s[1:]
+    elif s.startswith('-0.'):
+        s = '-' + s[2:]
+    return s
 
-    More specifically, sides[i] dictates how the path passes around circle[i].
+def join_numbers(numbers):
+    """
+    Joins formatted numbers, only adding a separator where the SVG path grammar
+    needs one: a minus sign, or a decimal point after a number that already
+    has one, starts a new number on its own.
+    """
+    joined = ''
+    for n in numbers:
+        if joined and not (n[0] == '-' or (n[0] == '.' and '.' in last)):
+            joined += ' '
+        joined += n
+        last = n
+    return joined
+
+def compact_path(tangents, arcs, precision):
+    """
+    Same path as draw_path's default output, written with relative commands,
+    packed arc flags and numbers rounded to precision decimal places.  Each
+    relative move is taken from the rounded position rather than the exact
+    one so rounding error does not accumulate along the path.
+    """
+    def fmt(x):
+        return format_number(x, precision)
+
+    position = (round(arcs[0].x0, precision), round(arcs[0].y0, precision))
+    commands = ['M' + join_numbers([fmt(position[0]), fmt(position[1])])]
+
+    def move_to(x, y):
+        nonlocal position
+        delta = (round(x - position[0], precision), round(y - position[1], precision))
+        position = (position[0] + delta[0], position[1] + delta[1])
+        return [fmt(delta[0]), fmt(delta[1])]
+
+    for i in range(len(arcs)):
+        a = arcs[i]
+        commands.append(
+            'a' + join_numbers([fmt(a.r), fmt(a.r), fmt(a.a)]) + ' ' +
+            '{}{}'.format(a.l, a.s) + join_numbers(move_to(a.x1, a.y1))
+        )
+        commands.append(
+            'l' + join_numbers(move_to(tangents[i].x1, tangents[i].y1))
+        )
+
+    return ''.join(commands)
+
+def path_segments(circles, sides):
+    """
+    Returns the tangents and arcs for the string-around-circles path described
+    in draw_path.  arcs[i] wraps circle[i] and is followed by tangents[i].
     """
-    dwg = svgwrite.Drawing()
     tangents = [
         tangent(circles[i], circles[i+1], sides[i], sides[i+1])
         for i in range(len(circles) - 1)
@@ -222,21 +287,51 @@ def draw_path(circles, sides):
         for i in range(len(tangents))
     ]
 
-    path_commands = [ 'M {} {}'.format(arcs[0].x0, arcs[0].y0) ]
-    for i in range(len(arcs)):
-        path_commands.append(arc_svg(arcs[i]))
-        path_commands.append(tangent_svg(tangents[i]))
+    return (tangents, arcs)
+
+def draw_path(circles, sides, precision=None, construction=True):
+    """
+    Takes a list of N Circle objects and a list of N side constants (LEFT or
+    RIGHT) and generates a path that traverses the circles as though it were a
+    piece of string wrapped around them. The sides list determines which side of
+    each circle the path passes by.
 
-    path = ' '.join(path_commands)
+    More specifically, sides[i] dictates how the path passes around circle[i].
+
+    With a precision, the path is written compactly (see compact_path) and the
+    construction circles are rounded to match. construction=False leaves the
+    construction circles out altogether.
+    """
+    import svgwrite
+    # svgwrite's path data validator is stricter than the SVG grammar and
+    # rejects the compact form, so only validate the default output
+    dwg = svgwrite.Drawing(debug=precision is None)
+    (tangents, arcs) = path_segments(circles, sides)
+
+    if precision is None:
+        path_commands = [ 'M {} {}'.format(arcs[0].x0, arcs[0].y0) ]
+        for i in range(len(arcs)):
+            path_commands.append(arc_svg(arcs[i]))
+            path_commands.append(tangent_svg(tangents[i]))
+
+        path = ' '.join(path_commands)
+    else:
+        path = compact_path(tangents, arcs, precision)
 
     svg_elements = [ dwg.path(path) ]
 
+    if not construction:
+        return svg_elements
+
     for circle in circles:
+        if precision is not None:
+            circle = Circle(*(round(v, precision) for v in circle))
         svg_elements.append(dwg.circle((circle.x, circle.y), circle.r, stroke='blue', fill_opacity=0))
 
     return svg_elements
 
 def just_draw_circles(circles):
+    import svgwrite
     dwg = svgwrite.Drawing()
     svg_elements = []
 
@@ -269,12 +364,19 @@ def compute_center(circles):
 
     return (sum_v[0] / n, sum_v[1] / n)
 
-def draw_arms(center):
+def draw_arms(center, precision=None, construction=True, **geometry):
+    return draw_path(*arm_circles(center, **geometry), precision, construction)
+    #return just_draw_circles(arm_circles(center)[0])
+
+def arm_circles(center, tip_radius=10, pit_radius=5, arm_lengths=(60, 101)):
+    """
+    Picks a random arm configuration centered on center and returns the
+    circles and sides that draw_path needs to trace it.  Arm lengths are
+    picked from the range arm_lengths, as (start, stop) for randrange.
+    """
     circles = []
     sides = []
-    tip_radius = 10
-    pit_radius = 5
-    arm_length = random.randrange(60, 101)
+    arm_length = random.randrange(*arm_lengths)
     pit_length = .25 * arm_length
     cylinder_start = .65 * arm_length
 
@@ -330,8 +432,7 @@ def draw_arms(center):
         for c in circles
     ]
 
-    return draw_path(shifted_circles, sides)
-    #return just_draw_circles(shifted_circles)
+    return (shifted_circles, sides)
 
 def draw_original():
     circles = [
@@ -381,7 +482,124 @@ def arm_positions():
     # angles repeats first two so don't overflow if 4 or 5 are chosen
     return angles[i:i+3]
 
-def main():
+def cell_centers(scaling, rows, columns):
+    """
+    Centers of the letterform cells on a sheet, in row-major order.
+    """
+    return [
+        (center_x, center_y)
+        for center_y in range(scaling//2, scaling*rows, scaling)
+        for center_x in range(scaling//2, scaling*columns, scaling)
+    ]
+
+def cell_seed(seed, row, column):
+    """
+    Seed for one cell of an incremental sheet, so that each letterform only
+    depends on its own cell and not on the cells drawn before it.
+    """
+    return '{}:{}:{}'.format(seed, row, column)
+
+def cell_fragment(center, seed, precision, construction, geometry):
+    """
+    SVG markup for the letterform in one cell of an incremental sheet.
+    """
+    random.seed(seed)
+    elements = draw_arms(center, precision, construction, **geometry)
+    return ''.join(element.tostring() for element in elements)
+
+def source_hash():
+    with open(__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def cell_hash(source, center, seed, precision, construction, geometry):
+    """
+    Hash of everything cell_fragment's output depends on, this file's
+    source included.
+    """
+    inputs = [source, center, seed, precision, construction, sorted(geometry.items())]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+def manifest_file_name(file_name):
+    return file_name + '.cells.json'
+
+def load_previous(file_name):
+    """
+    The previous incremental render of file_name, as its bytes and its
+    manifest's cells, or (None, {}) if there isn't a usable one.  An output
+    that no longer matches its manifest, say because it was rewritten by a
+    full render, isn't used.
+    """
+    try:
+        with open(manifest_file_name(file_name)) as f:
+            manifest = json.load(f)
+        with open(file_name, 'rb') as f:
+            data = f.read()
+    except (OSError, ValueError):
+        return (None, {})
+
+    if hashlib.sha256(data).hexdigest() != manifest.get('svg_hash'):
+        return (None, {})
+    return (data, manifest['cells'])
+
+IncrementalStats = collections.namedtuple('IncrementalStats', ['rendered', 'reused'])
+
+def render_incremental(file_name, rows, columns, seed, precision, construction,
+        geometry, overrides):
+    """
+    Writes a sheet like main(), seeding every cell on its own (see cell_seed),
+    and records each cell's input hash and byte range in a manifest next to
+    the output.  Cells whose inputs match the manifest are copied from the
+    previous output instead of being drawn again.  Returns IncrementalStats.
+    """
+    if seed is None:
+        raise ValueError('incremental rendering needs a seed')
+
+    import svgwrite
+    (previous, previous_cells) = load_previous(file_name)
+    source = source_hash()
+    dwg = svgwrite.Drawing(
+        profile='tiny', viewBox='0 0 {} {}'.format(SCALING * columns, SCALING * rows)
+    )
+    document = dwg.tostring()
+    end = document.rindex('</svg>')
+    output = [b'<?xml version="1.0" encoding="utf-8" ?>\n' + document[:end].encode()]
+    position = len(output[0])
+    cells = {}
+    stats = IncrementalStats(0, 0)
+
+    for (i, center) in enumerate(cell_centers(SCALING, rows, columns)):
+        (row, column) = divmod(i, columns)
+        cell_geometry = dict(geometry, **overrides.get((row, column), {}))
+        cell = cell_geometry.pop('seed', cell_seed(seed, row, column))
+        key = '{},{}'.format(row, column)
+        h = cell_hash(source, center, cell, precision, construction, cell_geometry)
+
+        entry = previous_cells.get(key)
+        if entry is not None and entry['hash'] == h:
+            fragment = previous[entry['start']:entry['end']]
+            stats = stats._replace(reused=stats.reused + 1)
+        else:
+            fragment = cell_fragment(
+                center, cell, precision, construction, cell_geometry
+            ).encode()
+            stats = stats._replace(rendered=stats.rendered + 1)
+
+        output.append(fragment)
+        cells[key] = {'hash': h, 'start': position, 'end': position + len(fragment)}
+        position += len(fragment)
+
+    output.append(document[end:].encode())
+    data = b''.join(output)
+    with open(file_name, 'wb') as f:
+        f.write(data)
+    with open(manifest_file_name(file_name), 'w') as f:
+        json.dump({'svg_hash': hashlib.sha256(data).hexdigest(), 'cells': cells}, f)
+
+    return stats
+
+def main(file_name='aphex.svg', precision=None, construction=True, seed=None,
+        rows=4, columns=7, tip_radius=10, pit_radius=5, arm_lengths=(60, 101),
+        overrides=None, incremental=False):
     """
     inspiration:
     http://www.dazeddigital.com/music/article/34849/1/aphex-twin-logo-designer-posts-early-blueprints-on-instagram
@@ -405,14 +623,40 @@ def main():
     x "center" letterforms
     - add variations on sides of arms
     - two or three arms
+
+    precision and construction select the compact output mode, see draw_path.
+    seed makes the sheet repeatable.  tip_radius, pit_radius and arm_lengths
+    are passed to arm_circles; overrides maps (row, column) to a dict of any
+    of them for that cell only.
+
+    incremental=True seeds each cell separately and only redraws the cells
+    whose inputs changed since the last incremental render, see
+    render_incremental.  An override can also give such a cell its own seed.
     """
-    scaling = 200
+    geometry = {
+        'tip_radius': tip_radius,
+        'pit_radius': pit_radius,
+        'arm_lengths': tuple(arm_lengths),
+    }
+    overrides = overrides or {}
+    if incremental:
+        return render_incremental(
+            file_name, rows, columns, seed, precision, construction,
+            geometry, overrides
+        )
+
+    import svgwrite
+
+    random.seed(seed)
     svg_elements = []
-    for center_y in range(scaling//2, scaling*4, scaling):
-        for center_x in range(scaling//2, scaling*7, scaling):
-            svg_elements += draw_arms((center_x, center_y))
+    for (i, center) in enumerate(cell_centers(SCALING, rows, columns)):
+        cell_geometry = dict(geometry, **overrides.get(divmod(i, columns), {}))
+        svg_elements += draw_arms(center, precision, construction, **cell_geometry)
 
-    dwg = svgwrite.Drawing('aphex.svg', profile='tiny', viewBox=('0 0 1400 800'))
+    dwg = svgwrite.Drawing(
+        file_name, profile='tiny',
+        viewBox='0 0 {} {}'.format(SCALING * columns, SCALING * rows)
+    )
     for svg_element in svg_elements:
         dwg.add(svg_element)
     dwg.save()
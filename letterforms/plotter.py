@@ -0,0 +1,280 @@
+import argparse
+import collections
+import math
+import random
+
+import aphex
+
+PlotStats = collections.namedtuple('PlotStats', ['draw', 'travel'])
+
+HPGL = 'hpgl'
+GCODE = 'gcode'
+FORMATS = [HPGL, GCODE]
+
+# HPGL plotter units per millimeter
+HPGL_UNITS = 40
+
+def distance(p0, p1):
+    return math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+
+def arc_center(a):
+    """
+    Converts an SVG endpoint-parameterized Arc to center form, following the
+    SVG spec's implementation notes (F.6.5) for the circular, unrotated case.
+    Returns (cx, cy, r, start_angle, sweep_angle) or None if the arc has no
+    extent (SVG omits those).
+    """
+    hx = (a.x0 - a.x1) / 2
+    hy = (a.y0 - a.y1) / 2
+    d2 = hx**2 + hy**2
+    if d2 == 0:
+        return None
+
+    # scale up radii that are too small to span the endpoints
+    r = max(a.r, math.sqrt(d2))
+    coef = math.sqrt(max(0, (r**2 - d2) / d2))
+    if a.l == a.s:
+        coef = -coef
+    cx = coef * hy + (a.x0 + a.x1) / 2
+    cy = -coef * hx + (a.y0 + a.y1) / 2
+
+    start = math.atan2(a.y0 - cy, a.x0 - cx)
+    sweep = math.atan2(a.y1 - cy, a.x1 - cx) - start
+    if a.s and sweep < 0:
+        sweep += 2 * math.pi
+    elif not a.s and sweep > 0:
+        sweep -= 2 * math.pi
+
+    return (cx, cy, r, start, sweep)
+
+def flatten_arc(a, tolerance):
+    """
+    Returns the points along Arc a (excluding its start point) such that no
+    chord strays more than tolerance from the true arc.
+    """
+    if tolerance <= 0:
+        raise ValueError('tolerance must be positive, got {}'.format(tolerance))
+    center = arc_center(a)
+    if center is None:
+        return []
+    (cx, cy, r, start, sweep) = center
+
+    step = 2 * math.acos(max(0, 1 - tolerance / r))
+    n = max(1, math.ceil(abs(sweep) / step))
+    points = [
+        (cx + r * math.cos(start + sweep * i / n),
+         cy + r * math.sin(start + sweep * i / n))
+        for i in range(1, n)
+    ]
+
+    return points + [(a.x1, a.y1)]
+
+def flatten_path(circles, sides, tolerance):
+    """
+    Flattens the path draw_path would emit for circles and sides into a closed
+    polyline (the first point is repeated at the end).
+    """
+    (tangents, arcs) = aphex.path_segments(circles, sides)
+
+    points = [(arcs[0].x0, arcs[0].y0)]
+    for i in range(len(arcs)):
+        points += flatten_arc(arcs[i], tolerance)
+        points.append((tangents[i].x1, tangents[i].y1))
+
+    # drop zero length segments
+    deduped = points[:1]
+    for point in points[1:]:
+        if point != deduped[-1]:
+            deduped.append(point)
+
+    return deduped
+
+def rotate_path(path, i):
+    """
+    Rotates closed polyline path so that it starts (and ends) at path[i].
+    """
+    if i == 0:
+        return path
+    return path[i:-1] + path[:i] + [path[i]]
+
+def nearest_neighbor(paths, home):
+    """
+    Greedy tour: from the pen's current position, go to the closest vertex of
+    any undrawn path and draw that path starting there.
+    """
+    remaining = set(range(len(paths)))
+    position = home
+    tour = []
+    while remaining:
+        (_, best, start) = min(
+            (distance(position, vertex), i, j)
+            for i in remaining
+            for (j, vertex) in enumerate(paths[i][:-1])
+        )
+        remaining.remove(best)
+        tour.append(rotate_path(paths[best], start))
+        position = tour[-1][-1]
+
+    return tour
+
+def two_opt(tour, home):
+    """
+    Improves a tour of closed paths by reversing runs of it while that
+    shortens pen-up travel.  Closed paths begin and end at the same point, so
+    reversing the visiting order never changes how a path itself is drawn.
+    """
+    tour = list(tour)
+    improved = True
+    while improved:
+        improved = False
+        points = [home] + [path[0] for path in tour]
+        for i in range(1, len(points) - 1):
+            for j in range(i + 1, len(points)):
+                before = distance(points[i-1], points[i])
+                after = distance(points[i-1], points[j])
+                if j + 1 < len(points):
+                    before += distance(points[j], points[j+1])
+                    after += distance(points[i], points[j+1])
+                if after < before - 1e-9:
+                    points[i:j+1] = reversed(points[i:j+1])
+                    tour[i-1:j] = reversed(tour[i-1:j])
+                    improved = True
+
+    return tour
+
+def refine_starts(tour, home):
+    """
+    Moves the start point of each closed path to the vertex that minimizes the
+    travel in from the previous path plus the travel out to the next one.
+    """
+    tour = list(tour)
+    for i in range(len(tour)):
+        previous = tour[i-1][-1] if i > 0 else home
+        following = tour[i+1][0] if i + 1 < len(tour) else None
+
+        def cost(j):
+            vertex = tour[i][j]
+            c = distance(previous, vertex)
+            if following is not None:
+                c += distance(vertex, following)
+            return c
+
+        best = min(range(len(tour[i]) - 1), key=cost)
+        tour[i] = rotate_path(tour[i], best)
+
+    return tour
+
+def optimize(paths, home=(0, 0)):
+    """
+    Orders closed paths (and picks where each one starts) to cut pen-up
+    travel: a nearest neighbor tour, improved by 2-opt.
+    """
+    tour = nearest_neighbor(paths, home)
+    tour = two_opt(tour, home)
+    return refine_starts(tour, home)
+
+def plot_stats(paths, home=(0, 0)):
+    """
+    Total pen-down (draw) and pen-up (travel) distance for plotting paths in
+    order, starting from home.
+    """
+    draw = 0
+    travel = 0
+    position = home
+    for path in paths:
+        travel += distance(position, path[0])
+        draw += sum(distance(path[i], path[i+1]) for i in range(len(path) - 1))
+        position = path[-1]
+
+    return PlotStats(draw, travel)
+
+def hpgl(paths, height, scale):
+    """
+    HPGL for paths.  scale is millimeters per SVG user unit; height is the
+    sheet height in user units, used to flip y since HPGL's origin is at the
+    bottom left.
+    """
+    def coords(p):
+        return '{},{}'.format(
+            round(p[0] * scale * HPGL_UNITS),
+            round((height - p[1]) * scale * HPGL_UNITS)
+        )
+
+    commands = ['IN', 'SP1']
+    for path in paths:
+        commands.append('PU' + coords(path[0]))
+        commands.append('PD' + ','.join(coords(p) for p in path[1:]))
+    commands += ['PU', 'SP0']
+
+    return ';\n'.join(commands) + ';\n'
+
+def gcode(paths, height, scale, pen_up=5, pen_down=0, feed=3000):
+    """
+    G-code for paths, lifting and lowering the pen on the Z axis.  scale and
+    height work as in hpgl.
+    """
+    def coords(p):
+        return 'X{:.3f} Y{:.3f}'.format(p[0] * scale, (height - p[1]) * scale)
+
+    lines = ['G21', 'G90', 'G0 Z{}'.format(pen_up)]
+    for path in paths:
+        lines.append('G0 ' + coords(path[0]))
+        lines.append('G1 Z{} F{}'.format(pen_down, feed))
+        lines += ['G1 ' + coords(p) for p in path[1:]]
+        lines.append('G0 Z{}'.format(pen_up))
+    lines.append('G0 X0 Y0')
+
+    return '\n'.join(lines) + '\n'
+
+def sheet_paths(scaling, rows, columns, tolerance):
+    """
+    Flattened paths for a random sheet laid out like aphex.main(), in its
+    row-major order.
+    """
+    return [
+        flatten_path(*aphex.arm_circles(center), tolerance)
+        for center in aphex.cell_centers(scaling, rows, columns)
+    ]
+
+def positive(text):
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError('must be positive, got {}'.format(text))
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export an aphex sheet for a pen plotter.'
+    )
+    parser.add_argument('--format', choices=FORMATS, default=HPGL)
+    parser.add_argument('--output', help='defaults to aphex.<format>')
+    parser.add_argument('--tolerance', type=positive, default=.25,
+        help='maximum chord deviation from true arcs, in SVG units')
+    parser.add_argument('--scale', type=float, default=.25,
+        help='millimeters per SVG unit')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    scaling = 200
+    (rows, columns) = (4, 7)
+    paths = sheet_paths(scaling, rows, columns, args.tolerance)
+
+    naive = plot_stats(paths)
+    paths = optimize(paths)
+    optimized = plot_stats(paths)
+    print('draw: {:.1f}'.format(optimized.draw))
+    print('travel: {:.1f} (row-major order: {:.1f}, saved {:.0%})'.format(
+        optimized.travel, naive.travel, 1 - optimized.travel / naive.travel
+    ))
+
+    height = scaling * rows
+    if args.format == HPGL:
+        output = hpgl(paths, height, args.scale)
+    else:
+        output = gcode(paths, height, args.scale)
+    with open(args.output or 'aphex.' + args.format, 'w') as f:
+        f.write(output)
+
+if __name__== "__main__":
+    main()
@@ -1,4 +1,8 @@
 import math
+import os
+import random
+import re
+import tempfile
 import unittest
 
 import aphex
@@ -180,5 +184,119 @@ class UtilTest(unittest.TestCase):
                 expected
             )
 
+NUMBER = re.compile(r'-?(\d+\.?\d*|\.\d+)')
+
+def parse_compact(d):
+    """
+    Reads compact_path output back into the absolute endpoints of each
+    command.
+    """
+    def number():
+        nonlocal i
+        while d[i] == ' ':
+            i += 1
+        match = NUMBER.match(d, i)
+        i = match.end()
+        return float(match.group())
+
+    points = []
+    i = 0
+    while i < len(d):
+        command = d[i]
+        i += 1
+        if command == 'a':
+            for _ in range(3):
+                number()
+            i += 3
+        (x, y) = (number(), number())
+        if command != 'M':
+            (x, y) = (points[-1][0] + x, points[-1][1] + y)
+        points.append((x, y))
+    return points
+
+class CompactTest(unittest.TestCase):
+    def test_format_number(self):
+        tests = [
+            (2.600000000000001, 2, '2.6'),
+            (3.1999999999999993, 2, '3.2'),
+            (0.25, 2, '.25'),
+            (-0.25, 2, '-.25'),
+            (-0.001, 2, '0'),
+            (10, 2, '10'),
+            (10.0, 0, '10'),
+            (123.456, 1, '123.5'),
+        ]
+        for (x, precision, expected) in tests:
+            self.assertEqual(aphex.format_number(x, precision), expected)
+
+    def test_join_numbers(self):
+        tests = [
+            (['1', '2'], '1 2'),
+            (['1', '-2'], '1-2'),
+            (['1.5', '.5'], '1.5.5'),
+            (['1', '.5'], '1 .5'),
+        ]
+        for (numbers, expected) in tests:
+            self.assertEqual(aphex.join_numbers(numbers), expected)
+
+    def test_compact_path(self):
+        tangents = [aphex.Segment(2, 0, 2, 3.3333333)]
+        arcs = [aphex.Arc(0, 0, 2, 0, 1, 0, l=0, s=1)]
+        self.assertEqual(
+            aphex.compact_path(tangents, arcs, 2),
+            'M0 0a1 1 0 012 0l0 3.33'
+        )
+
+    def test_compact_path_does_not_drift(self):
+        random.seed(1)
+        precision = 2
+        circles, sides = aphex.arm_circles((100, 100))
+        (tangents, arcs) = aphex.path_segments(circles, sides)
+        expected = [(arcs[0].x0, arcs[0].y0)]
+        for i in range(len(arcs)):
+            expected += [(arcs[i].x1, arcs[i].y1), (tangents[i].x1, tangents[i].y1)]
+
+        points = parse_compact(aphex.compact_path(tangents, arcs, precision))
+        self.assertEqual(len(points), len(expected))
+        for (point, exact) in zip(points, expected):
+            self.assertAlmostEqual(point[0], exact[0], delta=10**-precision)
+            self.assertAlmostEqual(point[1], exact[1], delta=10**-precision)
+
+class IncrementalTest(unittest.TestCase):
+    def render(self, file_name, **params):
+        return aphex.main(file_name, seed=1, rows=2, columns=3, incremental=True, **params)
+
+    def test_reuses_unchanged_cells(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sheet.svg')
+            self.assertEqual(self.render(path), aphex.IncrementalStats(6, 0))
+            self.assertEqual(self.render(path), aphex.IncrementalStats(0, 6))
+
+            overrides = {(1, 2): {'tip_radius': 12}}
+            self.assertEqual(
+                self.render(path, overrides=overrides), aphex.IncrementalStats(1, 5)
+            )
+            self.assertEqual(
+                self.render(path, tip_radius=11, overrides=overrides),
+                aphex.IncrementalStats(5, 1)
+            )
+
+            # the spliced output matches a render from scratch
+            fresh = os.path.join(directory, 'fresh.svg')
+            self.render(fresh, tip_radius=11, overrides=overrides)
+            with open(path) as f, open(fresh) as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_ignores_stale_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sheet.svg')
+            self.render(path)
+            aphex.main(path, seed=1, rows=2, columns=3)
+            self.assertEqual(self.render(path), aphex.IncrementalStats(6, 0))
+
+    def test_needs_seed(self):
+        with self.assertRaises(ValueError):
+            aphex.main(os.devnull, incremental=True)
+
 if __name__ == '__main__':
     unittest.main()
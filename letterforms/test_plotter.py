@@ -0,0 +1,91 @@
+import math
+import random
+import unittest
+
+import aphex
+import plotter
+
+class FlattenTest(unittest.TestCase):
+    def test_arc_center(self):
+        a = aphex.Arc(-1, 0, 1, 0, 1, 0, l=0, s=1)
+        (cx, cy, r, start, sweep) = plotter.arc_center(a)
+        self.assertAlmostEqual(cx, 0)
+        self.assertAlmostEqual(cy, 0)
+        self.assertEqual(r, 1)
+        self.assertAlmostEqual(start, math.pi)
+        self.assertAlmostEqual(sweep, math.pi)
+
+    def test_large_arc(self):
+        a = aphex.Arc(0, -5, 5, 0, 5, 0, l=1, s=1)
+        (cx, cy, r, start, sweep) = plotter.arc_center(a)
+        self.assertAlmostEqual(cx, 5)
+        self.assertAlmostEqual(cy, -5)
+        self.assertAlmostEqual(sweep, 1.5 * math.pi)
+
+    def test_flatten_arc(self):
+        a = aphex.Arc(-10, 0, 10, 0, 10, 0, l=0, s=0)
+        tolerance = .1
+        points = plotter.flatten_arc(a, tolerance)
+        self.assertEqual(points[-1], (10, 0))
+        previous = (-10, 0)
+        for point in points:
+            self.assertAlmostEqual(math.hypot(*point), 10)
+            # sweep flag 0 goes through the bottom of the circle (y down)
+            self.assertGreaterEqual(point[1], -1e-9)
+            midpoint = ((point[0] + previous[0]) / 2, (point[1] + previous[1]) / 2)
+            self.assertLessEqual(10 - math.hypot(*midpoint), tolerance)
+            previous = point
+
+        for tolerance in (0, -1):
+            with self.assertRaises(ValueError):
+                plotter.flatten_arc(a, tolerance)
+
+    def test_flatten_path_is_closed(self):
+        random.seed(1)
+        path = plotter.flatten_path(*aphex.arm_circles((100, 100)), .5)
+        self.assertAlmostEqual(path[0][0], path[-1][0])
+        self.assertAlmostEqual(path[0][1], path[-1][1])
+
+class OrderTest(unittest.TestCase):
+    def test_rotate_path(self):
+        path = [(0, 0), (1, 0), (1, 1), (0, 0)]
+        self.assertEqual(
+            plotter.rotate_path(path, 1),
+            [(1, 0), (1, 1), (0, 0), (1, 0)]
+        )
+
+    def test_plot_stats(self):
+        paths = [
+            [(1, 0), (2, 0), (1, 0)],
+            [(5, 0), (5, 3), (5, 0)],
+        ]
+        self.assertEqual(plotter.plot_stats(paths), plotter.PlotStats(8, 5))
+
+    def test_two_opt(self):
+        paths = [[(x, 0), (x, 1), (x, 0)] for x in (3, 1, 2, 4)]
+        tour = plotter.two_opt(paths, (0, 0))
+        self.assertEqual([p[0] for p in tour], [(1, 0), (2, 0), (3, 0), (4, 0)])
+
+    def test_optimize(self):
+        random.seed(7)
+        paths = plotter.sheet_paths(200, 4, 7, .5)
+        tour = plotter.optimize(paths)
+        naive = plotter.plot_stats(paths)
+        optimized = plotter.plot_stats(tour)
+        self.assertLess(optimized.travel, naive.travel)
+        self.assertAlmostEqual(optimized.draw, naive.draw)
+        self.assertEqual(
+            set(frozenset(p) for p in paths),
+            set(frozenset(p) for p in tour)
+        )
+
+class OutputTest(unittest.TestCase):
+    def test_hpgl(self):
+        paths = [[(0, 0), (10, 0), (0, 0)]]
+        self.assertEqual(
+            plotter.hpgl(paths, 100, .25),
+            'IN;\nSP1;\nPU0,1000;\nPD100,1000,0,1000;\nPU;\nSP0;\n'
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Content-addressed on-disk cache for the arrays the generators compute, such
+as straightlines strokes and horizon scaling fields.
+
+Results are keyed on a hash of the function's module source, its name, its
+arguments and the state of the random module when it is called.  The random
+state after the call is stored with the result and restored on a hit, so a
+cached render draws the same random numbers afterwards as an uncached one and
+produces the same output.  Functions that don't use the random module can be
+called with uses_random=False, which leaves the random state out of the key so
+their results are reused whatever was drawn before them.  Results are .npy files, memory-mapped read-only
+when loaded, and the least recently used ones are evicted once the cache
+grows past its size cap.
+"""
+import collections
+import hashlib
+import json
+import os
+import random
+import sys
+
+import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.render-cache')
+DEFAULT_MAX_BYTES = 1024**3
+
+class Cache:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.counts = collections.Counter()
+        self.sources = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def source_hash(self, fn):
+        module = sys.modules[fn.__module__]
+        if module.__name__ not in self.sources:
+            with open(module.__file__, 'rb') as f:
+                self.sources[module.__name__] = hashlib.sha256(f.read()).hexdigest()
+        return self.sources[module.__name__]
+
+    def key(self, fn, args, uses_random=True):
+        h = hashlib.sha256()
+        h.update(self.source_hash(fn).encode())
+        h.update(fn.__qualname__.encode())
+        for arg in args:
+            update_hash(h, arg)
+        if uses_random:
+            h.update(repr(random.getstate()).encode())
+        else:
+            h.update(b'no random state')
+        return h.hexdigest()
+
+    def paths(self, key):
+        stem = os.path.join(self.directory, key)
+        return (stem + '.npy', stem + '.json')
+
+    def call(self, fn, *args, uses_random=True):
+        """
+        fn(*args), from the cache if it has been called the same way before.
+        uses_random=False says fn doesn't touch the random module, so the
+        random state is neither part of the key nor restored on a hit.
+        """
+        (data_path, state_path) = self.paths(self.key(fn, args, uses_random))
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            result = np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            result = None
+
+        if result is not None:
+            self.counts['hits'] += 1
+            if uses_random:
+                (version, internal, gauss) = state
+                random.setstate((version, tuple(internal), gauss))
+            # mtime doubles as the last access time for eviction
+            os.utime(data_path)
+            return result
+
+        self.counts['misses'] += 1
+        # return the array that's stored so later calls that take it as an
+        # argument hash the same whether this was a hit or a miss
+        result = np.asarray(fn(*args))
+        self.store(data_path, state_path, result,
+            random.getstate() if uses_random else None)
+        return result
+
+    def store(self, data_path, state_path, result, state):
+        # write under temporary names first so readers never see partial files
+        with open(data_path + '.tmp', 'wb') as f:
+            np.save(f, result)
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(state_path + '.tmp', state_path)
+        os.replace(data_path + '.tmp', data_path)
+        self.evict()
+
+    def entries(self):
+        """
+        (mtime, size, key) for each cached result, least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name[:-len('.npy')]))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, key) in entries:
+            if total <= self.max_bytes:
+                break
+            for path in self.paths(key):
+                os.remove(path)
+            total -= size
+            self.counts['evictions'] += 1
+
+    def clear(self):
+        for (_, _, key) in self.entries():
+            for path in self.paths(key):
+                os.remove(path)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'hits': self.counts['hits'],
+            'misses': self.counts['misses'],
+            'evictions': self.counts['evictions'],
+            'entries': len(entries),
+            'bytes': sum(size for (_, size, _) in entries),
+        }
+
+def update_hash(h, arg):
+    """
+    Feeds arg into hash h, including array shapes and types so that different
+    arguments can't produce the same bytes.  Sequences of numbers hash like
+    the equivalent arrays.
+    """
+    if isinstance(arg, (list, tuple)):
+        a = np.asarray(arg)
+        if a.dtype != object:
+            arg = a
+
+    if isinstance(arg, np.ndarray):
+        h.update('ndarray{}{}'.format(arg.dtype.str, arg.shape).encode())
+        h.update(np.ascontiguousarray(arg).tobytes())
+    elif isinstance(arg, (list, tuple)):
+        h.update('{}{}'.format(type(arg).__name__, len(arg)).encode())
+        for item in arg:
+            update_hash(h, item)
+    else:
+        h.update(repr(arg).encode())
@@ -0,0 +1,188 @@
+"""
+Long-lived local render service.  Keeps the generators (and numpy, PIL and
+svgwrite) imported between renders so previews skip the interpreter and
+import startup cost.
+
+    python3 renderd.py serve
+    python3 renderd.py render horizon1 '{"width": 480, "height": 270}' -o h.png
+
+Jobs are POSTed to / as JSON:
+
+    {"generator": "sl", "params": {"scale": 85, "seed": 1}, "output": "sl.png"}
+
+With an output path (relative to the server's working directory) the reply
+is JSON with the absolute output path and the render time in milliseconds.
+Without one (or with a null one) the rendered file itself is the reply body,
+with the render time in the X-Render-Ms header.  GET /stats reports latency
+per generator, and hit/miss counts for the cache when serve is given a
+--cache-dir.
+
+Jobs run one at a time since the generators share the global random state.
+"""
+import argparse
+import collections
+import http.server
+import json
+import os
+import tempfile
+import time
+import urllib.request
+
+import generators
+import rendercache
+
+PORT = 8421
+
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.svg': 'image/svg+xml',
+}
+
+def run_job(job, cache=None):
+    """
+    Renders one job and returns (output path, elapsed milliseconds).  Without
+    an output in the job the render goes to a temporary file, which the caller
+    is responsible for removing.  cache is an optional rendercache.Cache.
+    """
+    name = job['generator']
+    generator = generators.lookup(name)
+    output = job.get('output')
+    temporary = output is None
+    if temporary:
+        (fd, output) = tempfile.mkstemp(suffix=generator.extension)
+        os.close(fd)
+
+    start = time.perf_counter()
+    try:
+        generators.render(
+            name, os.path.abspath(output), cache, **job.get('params', {})
+        )
+    except Exception:
+        if temporary:
+            os.remove(output)
+        raise
+    elapsed = (time.perf_counter() - start) * 1000
+
+    return (os.path.abspath(output), elapsed)
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def send_body(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for (key, value) in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, obj):
+        self.send_body(status, json.dumps(obj).encode(), 'application/json')
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        stats = {
+            name: {
+                'jobs': len(times),
+                'mean_ms': sum(times) / len(times),
+                'last_ms': times[-1],
+            }
+            for (name, times) in self.server.latencies.items()
+        }
+        if self.server.cache is not None:
+            stats['cache'] = self.server.cache.stats()
+        self.send_json(200, stats)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length))
+            (output, elapsed) = run_job(job, self.server.cache)
+        except Exception as e:
+            self.send_json(400, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+
+        self.server.latencies[job['generator']].append(elapsed)
+        self.log_message('%s rendered in %.1f ms', job['generator'], elapsed)
+
+        if job.get('output') is not None:
+            self.send_json(200, {'output': output, 'ms': elapsed})
+            return
+
+        try:
+            with open(output, 'rb') as f:
+                body = f.read()
+        finally:
+            os.remove(output)
+        extension = os.path.splitext(output)[1]
+        self.send_body(
+            200, body, CONTENT_TYPES[extension],
+            [('X-Render-Ms', '{:.1f}'.format(elapsed))]
+        )
+
+def make_server(port=PORT, cache=None):
+    """
+    Imports every generator up front and returns an HTTP server for jobs,
+    bound to localhost.  port=0 picks a free port.  cache is an optional
+    rendercache.Cache shared by all jobs.
+    """
+    for name in generators.GENERATORS:
+        generators.load(name)
+
+    server = http.server.HTTPServer(('127.0.0.1', port), Handler)
+    server.latencies = collections.defaultdict(list)
+    server.cache = cache
+    return server
+
+def submit(job, port=PORT):
+    """
+    Sends job to a running server.  Returns the decoded JSON reply, or the
+    rendered bytes and render time when the job has no output.
+    """
+    request = urllib.request.Request(
+        'http://127.0.0.1:{}/'.format(port),
+        data=json.dumps(job).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+        if response.headers['Content-Type'] == 'application/json':
+            return json.loads(body)
+        return (body, float(response.headers['X-Render-Ms']))
+
+def main():
+    parser = argparse.ArgumentParser(description='Local render service.')
+    parser.add_argument('--port', type=int, default=PORT)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    serve = commands.add_parser('serve')
+    serve.add_argument('--cache-dir',
+        help='cache generated strokes and fields here (see rendercache.py)')
+    serve.add_argument('--cache-size', type=int, default=1024,
+        help='cache size cap in megabytes')
+    render = commands.add_parser('render')
+    render.add_argument('generator', choices=sorted(generators.GENERATORS))
+    render.add_argument('params', nargs='?', default='{}',
+        help='JSON object of parameters for the generator')
+    render.add_argument('-o', '--output')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        cache = None
+        if args.cache_dir:
+            cache = rendercache.Cache(args.cache_dir, args.cache_size * 1024**2)
+        server = make_server(args.port, cache)
+        print('listening on 127.0.0.1:{}'.format(server.server_port))
+        server.serve_forever()
+        return
+
+    job = {'generator': args.generator, 'params': json.loads(args.params)}
+    extension = generators.lookup(args.generator).extension
+    job['output'] = os.path.abspath(args.output or args.generator + extension)
+    reply = submit(job, args.port)
+    print('{} ({:.1f} ms)'.format(reply['output'], reply['ms']))
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,101 @@
+import collections
+import multiprocessing
+import os
 import random
+from multiprocessing import shared_memory
 
 import numpy as np
 from PIL import Image
 
+# pipeline stages, for instrument.py
+STAGES = ['main', 'poster', 'plan_walks', 'draw_sheet', 'draw_strokes',
+    'init_solid', 'random_walk', 'make_line', 'make_line2', 'make_line3',
+    'draw_line', 'save_image']
+
+# stroke seeds for make_line: 5 pixels, left to right
+HARD = np.array((
+    0, 0, 0,
+    0, 0, 0,
+    0, 0, 0,
+    0, 0, 0,
+    0, 0, 0,
+))
+
+SOFT1 = np.array((
+    64, 64, 64,
+    32, 32, 32,
+    0, 0, 0,
+    32, 32, 32,
+    64, 64, 64,
+))
+
+SOFT2 = np.array((
+    128, 128, 128,
+    64, 64, 64,
+    0, 0, 0,
+    64, 64, 64,
+    128, 128, 128,
+))
+
+SOFT3 = np.array((
+    192, 192, 192,
+    96, 96, 96,
+    0, 0, 0,
+    96, 96, 96,
+    192, 192, 192,
+))
+
+SOFT_LEFT1 = np.array((
+    0, 0, 0,
+    64, 64, 64,
+    96, 96, 96,
+    112, 112, 112,
+    120, 120, 120,
+))
+
+SOFT_LEFT2 = np.array((
+    64, 64, 64,
+    0, 0, 0,
+    64, 64, 64,
+    96, 96, 96,
+    112, 112, 112,
+))
+
+SOFT_LEFT3 = np.array((
+    0, 0, 0,
+    64, 64, 64,
+    96, 96, 96,
+    128, 128, 128,
+    192, 192, 192,
+))
+
+SKINNY1 = np.array((
+    0, 0, 0,
+    0, 0, 0,
+    0, 0, 0,
+    255, 255, 255,
+    255, 255, 255,
+))
+
+SKINNY2 = np.array((
+    0, 0, 0,
+    0, 0, 0,
+    255, 255, 255,
+    255, 255, 255,
+    255, 255, 255,
+))
+
+SKINNY3 = np.array((
+    0, 0, 0,
+    255, 255, 255,
+    255, 255, 255,
+    255, 255, 255,
+    255, 255, 255,
+))
+
+SEEDS = [HARD, SOFT1, SOFT2, SOFT3, SOFT_LEFT1, SOFT_LEFT2, SOFT_LEFT3, SKINNY1,
+    SKINNY2, SKINNY3]
+
 def save_image(file_name, image_data):
     img = Image.fromarray(np.uint8(image_data), 'RGB')
     img.save(file_name)
@@ -33,12 +126,21 @@ def random_walk(how_often, length, minimum, maximum, start):
         w.append(c)
     return w
 
-def make_line(height, seed):
+def resample(walk, length):
+    """
+    Stretches or shrinks walk to length values by nearest neighbor sampling.
+    """
+    if len(walk) == length:
+        return walk
+    return [walk[i * len(walk) // length] for i in range(length)]
+
+def make_line(height, seed, offsets=None):
     # generate "rotation" offsets
     #    for every row, .05 chance of either rotating by 1 in either direction
     # rotate seed as needed while tiling (or after)
 
-    offsets = random_walk(.05, height, 0, 4, 0)
+    if offsets is None:
+        offsets = random_walk(.05, height, 0, 4, 0)
     line = np.tile(seed, height).reshape(height, 5, 3)
 
     for i in range(height):
@@ -46,12 +148,13 @@ def make_line(height, seed):
 
     return line
 
-def make_line2(height):
+def make_line2(height, offsets=None):
     GRAY_128 = np.array((128, 128, 128))
     GRAY_192 = np.array((192, 192, 192))
     WHITE = np.array((255, 255, 255))
     BLACK = np.array((0, 0, 0))
-    offsets = random_walk(.1, height, 0, 2, 0)
+    if offsets is None:
+        offsets = random_walk(.1, height, 0, 2, 0)
     canvas = np.tile(WHITE, height * 5).reshape(height, 5, 3)
     prev = 0
     for i in range(height):
@@ -59,19 +162,22 @@ def make_line2(height):
         canvas[i][offset] = BLACK
         if offset != prev:
             canvas[i][prev] = GRAY_128
-            canvas[i+1][prev] = GRAY_192
+            # a step on the last row has no next row to fade into
+            if i + 1 < height:
+                canvas[i+1][prev] = GRAY_192
             canvas[i-1][offset] = GRAY_128
             canvas[i-2][offset] = GRAY_192
         prev = offset
 
     return canvas
 
-def make_line3(height):
+def make_line3(height, offsets=None):
     GRAY_128 = np.array((128, 128, 128))
     GRAY_192 = np.array((192, 192, 192))
     WHITE = np.array((255, 255, 255))
     BLACK = np.array((0, 0, 0))
-    offsets = random_walk(.8, height, 0, 1, 0)
+    if offsets is None:
+        offsets = random_walk(.8, height, 0, 1, 0)
     canvas = np.tile(WHITE, height * 3).reshape(height, 3, 3)
     prev = 0
     for i in range(height):
@@ -79,127 +185,244 @@ def make_line3(height):
         canvas[i][offset] = BLACK
         if offset != prev:
             canvas[i][prev] = GRAY_128
-            canvas[i+1][prev] = GRAY_192
+            # a step on the last row has no next row to fade into
+            if i + 1 < height:
+                canvas[i+1][prev] = GRAY_192
             canvas[i-1][offset] = GRAY_128
             canvas[i-2][offset] = GRAY_192
         prev = offset
 
     return canvas
 
-def main():
-    # macbook air screen resolution: 128 dpi
-    # cheap-ish laser printer resolution: 600 dpi
-    # printer has 4.6825x the resolution
-
-    #SCALE = 85
-    SCALE = 100 * 4.6825
-    IMAGE_WIDTH = int(16 * SCALE)
-    IMAGE_HEIGHT = int(9 * SCALE)
-    MARGIN = int(SCALE / 2)
+def sheet_size(scale):
+    """
+    Returns the image width and height and the margin for a sheet at scale.
+    """
+    return (int(16 * scale), int(9 * scale), int(scale / 2))
+
+def cached(cache, fn, *args, uses_random=True):
+    """
+    fn(*args), or the result of an earlier call with the same arguments (and
+    random state, if fn uses_random) from cache, a rendercache.Cache, if there
+    is one.
+    """
+    if cache is None:
+        return fn(*args)
+    return cache.call(fn, *args, uses_random=uses_random)
+
+def plan_walks(height, count):
+    """
+    Generates the walks for count make_line strokes followed by a make_line2
+    and a make_line3 stroke, in the order drawing them one by one would.
+    """
+    walks = [random_walk(.05, height, 0, 4, 0) for i in range(count)]
+    walks.append(random_walk(.1, height, 0, 2, 0))
+    walks.append(random_walk(.8, height, 0, 1, 0))
+
+    return walks
+
+def check_scale(scale, count):
+    """
+    Raises ValueError unless count make_line strokes, then a make_line2 and a
+    make_line3 stroke, fit on a sheet at scale the way draw_sheet lays them
+    out.
+    """
+    (width, height, margin) = sheet_size(scale)
+    # left column of the make_line3 stroke, which is 3 pixels wide
+    last = count + 1
+    if height - 2 * margin < 1 or margin * (last + 1) + 5 * last + 3 > width:
+        raise ValueError('{} strokes do not fit on a sheet at scale {:g}'.format(
+            count + 2, scale
+        ))
+
+def draw_sheet(scale, seeds, walks, cache=None):
+    """
+    Draws the strokes planned by plan_walks on a sheet at scale.  Walks
+    planned at another scale are resampled to this sheet's stroke height.
+    """
+    (IMAGE_WIDTH, IMAGE_HEIGHT, MARGIN) = sheet_size(scale)
     WHITE = np.array((255, 255, 255))
-    LINE_WIDTH = 5
-
-    HARD = np.array((
-        0, 0, 0,
-        0, 0, 0,
-        0, 0, 0,
-        0, 0, 0,
-        0, 0, 0,
-    ))
-
-    SOFT1 = np.array((
-        64, 64, 64,
-        32, 32, 32,
-        0, 0, 0,
-        32, 32, 32,
-        64, 64, 64,
-    ))
-
-    SOFT2 = np.array((
-        128, 128, 128,
-        64, 64, 64,
-        0, 0, 0,
-        64, 64, 64,
-        128, 128, 128,
-    ))
-
-    SOFT3 = np.array((
-        192, 192, 192,
-        96, 96, 96,
-        0, 0, 0,
-        96, 96, 96,
-        192, 192, 192,
-    ))
-
-    SOFT_LEFT1 = np.array((
-        0, 0, 0,
-        64, 64, 64,
-        96, 96, 96,
-        112, 112, 112,
-        120, 120, 120,
-    ))
-
-    SOFT_LEFT2 = np.array((
-        64, 64, 64,
-        0, 0, 0,
-        64, 64, 64,
-        96, 96, 96,
-        112, 112, 112,
-    ))
-
-    SOFT_LEFT3 = np.array((
-        0, 0, 0,
-        64, 64, 64,
-        96, 96, 96,
-        128, 128, 128,
-        192, 192, 192,
-    ))
-
-    SKINNY1 = np.array((
-        0, 0, 0,
-        0, 0, 0,
-        0, 0, 0,
-        255, 255, 255,
-        255, 255, 255,
-    ))
-
-    SKINNY2 = np.array((
-        0, 0, 0,
-        0, 0, 0,
-        255, 255, 255,
-        255, 255, 255,
-        255, 255, 255,
-    ))
-
-    SKINNY3 = np.array((
-        0, 0, 0,
-        255, 255, 255,
-        255, 255, 255,
-        255, 255, 255,
-        255, 255, 255,
-    ))
 
     canvas = init_solid(IMAGE_WIDTH, IMAGE_HEIGHT, WHITE)
     height = IMAGE_HEIGHT - (MARGIN * 2)
+    walks = [resample(walk, height) for walk in walks]
 
-    seeds = [HARD, SOFT1, SOFT2, SOFT3, SOFT_LEFT1, SOFT_LEFT2, SOFT_LEFT3, SKINNY1,
-        SKINNY2, SKINNY3]
     for (i, line_seed) in enumerate(seeds):
         canvas = draw_line(
             canvas, (MARGIN, (MARGIN * (i+1)) + (5 * i)),
-            make_line(height, line_seed)
+            cached(cache, make_line, height, line_seed, walks[i], uses_random=False)
         )
 
     i = len(seeds)
-    canvas = draw_line(canvas, (MARGIN, (MARGIN * (i+1)) + (5 * i)), make_line2(height))
+    canvas = draw_line(canvas, (MARGIN, (MARGIN * (i+1)) + (5 * i)),
+        cached(cache, make_line2, height, walks[i], uses_random=False))
 
     i += 1
-    canvas = draw_line(canvas, (MARGIN, (MARGIN * (i+1)) + (5 * i)), make_line3(height))
+    canvas = draw_line(canvas, (MARGIN, (MARGIN * (i+1)) + (5 * i)),
+        cached(cache, make_line3, height, walks[i], uses_random=False))
 
+    return canvas
 
+LINE = 'line'
+LINE2 = 'line2'
+LINE3 = 'line3'
+STROKE_WIDTHS = {LINE: 5, LINE2: 5, LINE3: 3}
+
+# A stroke for draw_strokes.  kind picks make_line, make_line2 or make_line3;
+# seed is make_line's seed array.  position is the (row, column) of the top
+# left corner.  rng_seed seeds the stroke's own random walk.
+Stroke = collections.namedtuple(
+    'Stroke', ['kind', 'seed', 'position', 'height', 'rng_seed']
+)
+
+def make_stroke(stroke):
+    random.seed(stroke.rng_seed)
+    if stroke.kind == LINE:
+        return make_line(stroke.height, stroke.seed)
+    elif stroke.kind == LINE2:
+        return make_line2(stroke.height)
+    else:
+        return make_line3(stroke.height)
+
+# the shared canvas, in draw_strokes' worker processes
+worker_canvas = None
+
+def attach_canvas(name, shape):
+    global worker_canvas
+    shm = shared_memory.SharedMemory(name=name)
+    worker_canvas = (shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+
+def paint_stroke(canvas, stroke):
+    (row, column) = stroke.position
+    line = make_stroke(stroke)
+    canvas[row:row+line.shape[0], column:column+line.shape[1]] = line
+
+def draw_stroke(stroke):
+    paint_stroke(worker_canvas[1], stroke)
+
+def check_columns(strokes):
+    """
+    Raises ValueError unless the strokes' column ranges are disjoint, which
+    is what lets draw_strokes' workers write without coordinating.
+    """
+    spans = sorted(
+        (s.position[1], s.position[1] + STROKE_WIDTHS[s.kind]) for s in strokes
+    )
+    for (a, b) in zip(spans, spans[1:]):
+        if b[0] < a[1]:
+            raise ValueError('strokes overlap in columns {} to {}'.format(b[0], a[1]))
+
+def draw_strokes(width, height, strokes, processes=None):
+    """
+    Draws strokes on a white canvas using a pool of processes (all cores by
+    default).  The canvas lives in shared memory and every worker writes its
+    strokes straight into it, so only the small Stroke jobs are pickled.
+    Each stroke seeds its own walk, so the result doesn't depend on how the
+    strokes are scheduled.
+    """
+    check_columns(strokes)
+    shape = (height, width, 3)
+
+    if processes == 1:
+        canvas = np.full(shape, 255, dtype=np.uint8)
+        for stroke in strokes:
+            paint_stroke(canvas, stroke)
+        return canvas
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+    canvas = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        canvas[...] = 255
+        with multiprocessing.Pool(
+            processes, initializer=attach_canvas, initargs=(shm.name, shape)
+        ) as pool:
+            # a few chunks per worker keeps them busy without much messaging
+            chunks = 4 * (processes or os.cpu_count())
+            pool.map(draw_stroke, strokes, chunksize=max(1, len(strokes) // chunks))
+        return canvas.copy()
+    finally:
+        # the view has to go before the shared memory can be closed
+        del canvas
+        shm.close()
+        shm.unlink()
+
+def poster_strokes(scale, count, seed=None):
+    """
+    count strokes spread evenly across a sheet at scale, with kinds and
+    seeds picked at random.  seed makes the choice and every stroke's walk
+    repeatable.
+    """
+    (width, height, margin) = sheet_size(scale)
+    spacing = (width - 2 * margin) / count
+    if spacing < max(STROKE_WIDTHS.values()):
+        raise ValueError('{} strokes do not fit at scale {}'.format(count, scale))
+
+    rng = random.Random(seed)
+    kinds = [LINE] * len(SEEDS) + [LINE2, LINE3]
+    strokes = []
+    for i in range(count):
+        kind = rng.choice(kinds)
+        strokes.append(Stroke(
+            kind,
+            rng.choice(SEEDS) if kind == LINE else None,
+            (margin, margin + int(i * spacing)),
+            height - 2 * margin,
+            rng.getrandbits(32),
+        ))
+    return strokes
+
+def preview_file_name(file_name):
+    (root, extension) = os.path.splitext(file_name)
+    return root + '.preview' + extension
+
+def main(file_name='sl.png', scale=100 * 4.6825, seed=None, preview=None,
+        cache=None):
+    """
+    With preview, first saves a copy at 1/preview of the scale next to
+    file_name (sl.png -> sl.preview.png).  It is drawn from the same walks as
+    the full size sheet, so it previews exactly what will follow.
+
+    cache (a rendercache.Cache) skips regenerating the walks and strokes of
+    a sheet drawn before with the same seed, at any scale.  Unseeded sheets
+    are never cached.
+    """
+    # macbook air screen resolution: 128 dpi
+    # cheap-ish laser printer resolution: 600 dpi
+    # printer has 4.6825x the resolution
+
+    #SCALE = 85
+    SCALE = scale
+    random.seed(seed)
+
+    if seed is None:
+        cache = None
+
+    check_scale(SCALE, len(SEEDS))
+    if preview:
+        try:
+            check_scale(SCALE / preview, len(SEEDS))
+        except ValueError as e:
+            raise ValueError('preview {} shrinks the sheet too far: {}'.format(preview, e))
+
+    (_, IMAGE_HEIGHT, MARGIN) = sheet_size(SCALE)
+    walks = cached(cache, plan_walks, IMAGE_HEIGHT - (MARGIN * 2), len(SEEDS))
+
+    if preview:
+        save_image(
+            preview_file_name(file_name),
+            draw_sheet(SCALE / preview, SEEDS, walks, cache)
+        )
 
+    save_image(file_name, draw_sheet(SCALE, SEEDS, walks, cache))
 
-    save_image('sl.png', canvas)
+def poster(file_name='poster.png', scale=100 * 4.6825, count=200, seed=None,
+        processes=None):
+    """
+    A sheet of count strokes drawn in parallel by draw_strokes.
+    """
+    (width, height, _) = sheet_size(scale)
+    strokes = poster_strokes(scale, count, seed)
+    save_image(file_name, draw_strokes(width, height, strokes, processes))
 
 if __name__== "__main__":
     main()
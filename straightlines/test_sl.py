@@ -1,9 +1,105 @@
+import os
+import random
+import tempfile
 import unittest
 
 import numpy as np
+from PIL import Image
+
+import sl
 
 class SLTest(unittest.TestCase):
-    pass
+    def test_random_walk(self):
+        random.seed(1)
+        walk = sl.random_walk(.5, 1000, 0, 4, 2)
+        self.assertEqual(len(walk), 1000)
+        self.assertEqual(min(walk), 0)
+        self.assertEqual(max(walk), 4)
+        for (a, b) in zip(walk, walk[1:]):
+            self.assertLessEqual(abs(a - b), 1)
+
+    def test_draw_line(self):
+        canvas = sl.init_solid(4, 3, np.array((255, 255, 255)))
+        line = np.zeros((2, 1, 3))
+        result = sl.draw_line(canvas, (1, 2), line)
+        self.assertEqual(result[1:3, 2].sum(), 0)
+        self.assertEqual(result.sum(), (4 * 3 - 2) * 3 * 255)
+        self.assertEqual(canvas.sum(), 4 * 3 * 3 * 255)
+
+    def test_make_line2_steps_on_last_row(self):
+        # a step on the last row used to index past the canvas
+        line = sl.make_line2(4, [0, 0, 0, 1])
+        self.assertEqual(line.shape, (4, 5, 3))
+        self.assertEqual(line[3, 1].sum(), 0)
+        self.assertEqual(line[3, 0].tolist(), [128, 128, 128])
+
+    def test_make_line3_steps_on_last_row(self):
+        # walks that move on their last row used to index past the canvas
+        for seed in range(20):
+            random.seed(seed)
+            self.assertEqual(sl.make_line3(10).shape, (10, 3, 3))
+
+    def test_resample(self):
+        walk = [0, 1, 2, 3]
+        self.assertIs(sl.resample(walk, 4), walk)
+        self.assertEqual(sl.resample(walk, 2), [0, 2])
+        self.assertEqual(sl.resample(walk, 8), [0, 0, 1, 1, 2, 2, 3, 3])
+
+    def test_preview(self):
+        with tempfile.TemporaryDirectory() as directory:
+            progressive = os.path.join(directory, 'progressive.png')
+            direct = os.path.join(directory, 'direct.png')
+            sl.main(progressive, 40, seed=3, preview=4)
+            sl.main(direct, 40, seed=3)
+
+            preview = Image.open(sl.preview_file_name(progressive))
+            self.assertEqual(preview.size, (160, 90))
+            np.testing.assert_equal(
+                np.asarray(Image.open(progressive)),
+                np.asarray(Image.open(direct))
+            )
+
+    def test_preview_too_small(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sl.png')
+            with self.assertRaises(ValueError):
+                sl.main(path, 85, seed=1, preview=20)
+            self.assertFalse(os.path.exists(path))
+
+    def test_check_scale(self):
+        sl.check_scale(85 / 10, len(sl.SEEDS))
+        with self.assertRaises(ValueError):
+            sl.check_scale(85 / 20, len(sl.SEEDS))
+
+    def test_draw_strokes(self):
+        strokes = sl.poster_strokes(40, 30, seed=2)
+        (width, height, _) = sl.sheet_size(40)
+        serial = sl.draw_strokes(width, height, strokes, processes=1)
+        parallel = sl.draw_strokes(width, height, strokes, processes=2)
+        np.testing.assert_equal(serial, parallel)
+        self.assertLess(serial.min(), 255)
+
+    def test_poster_strokes(self):
+        strokes = sl.poster_strokes(40, 30, 5)
+        again = sl.poster_strokes(40, 30, 5)
+        self.assertEqual(len(strokes), len(again))
+        for (a, b) in zip(strokes, again):
+            self.assertEqual(
+                (a.kind, a.position, a.height, a.rng_seed),
+                (b.kind, b.position, b.height, b.rng_seed)
+            )
+            np.testing.assert_equal(a.seed, b.seed)
+        with self.assertRaises(ValueError):
+            sl.poster_strokes(40, 1000)
+
+    def test_check_columns(self):
+        strokes = [
+            sl.Stroke(sl.LINE, sl.HARD, (0, 0), 10, 1),
+            sl.Stroke(sl.LINE3, None, (0, 4), 10, 2),
+        ]
+        with self.assertRaises(ValueError):
+            sl.check_columns(strokes)
+        sl.check_columns(strokes[:1] + [strokes[1]._replace(position=(0, 5))])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,181 @@
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import generate
+import generators
+
+class ParamsTest(unittest.TestCase):
+    def test_params_match_entry_points(self):
+        for (name, generator) in generators.GENERATORS.items():
+            entry = getattr(generators.load(name), generator.function)
+            signature = inspect.signature(entry).parameters
+            for param in generator.params:
+                self.assertIn(param.name, signature, name)
+                self.assertEqual(param.default, signature[param.name].default,
+                    '{} {}'.format(name, param.name))
+
+    def test_curve_choices(self):
+        horizon1 = generators.load('horizon1')
+        (curve,) = [p for p in generators.lookup('horizon1').params if p.name == 'curve']
+        self.assertEqual(sorted(curve.choices), sorted(horizon1.TONE_CURVES))
+
+    def test_validate(self):
+        generators.validate('sl', {'scale': 40, 'seed': 1, 'preview': None})
+        bad = [
+            {'bogus': 1},
+            {'scale': 'big'},
+            {'seed': 1.5},
+            {'seed': True},
+        ]
+        for params in bad:
+            with self.assertRaises(ValueError):
+                generators.validate('sl', params)
+        with self.assertRaises(ValueError):
+            generators.validate('horizon1', {'curve': 'nope'})
+        with self.assertRaises(ValueError):
+            generators.validate('sl', [1])
+
+    def test_validate_checks_combinations(self):
+        generators.validate('aphex', {'incremental': True, 'seed': 1})
+        with self.assertRaises(ValueError):
+            generators.validate('aphex', {'incremental': True})
+
+    def test_parsers(self):
+        self.assertEqual(generators.number('10'), 10)
+        self.assertIsInstance(generators.number('10'), int)
+        self.assertEqual(generators.number('.5'), .5)
+        self.assertIs(generators.boolean('False'), False)
+        with self.assertRaises(ValueError):
+            generators.boolean('maybe')
+
+    def test_bounds_match_generators(self):
+        sl = generators.load('sl')
+        sl.check_scale(generators.SL_MIN_SCALE, len(sl.SEEDS))
+        with self.assertRaises(ValueError):
+            sl.check_scale(generators.SL_MIN_SCALE - .001, len(sl.SEEDS))
+
+        for (scale, count) in [(40, 50), (40, 100), (40, 200), (85, 200), (10, 20)]:
+            try:
+                sl.poster_strokes(scale, count)
+                fits = True
+            except ValueError:
+                fits = False
+            params = {'scale': scale, 'count': count}
+            if fits:
+                generators.validate('sl-poster', params)
+            else:
+                with self.assertRaises(ValueError):
+                    generators.validate('sl-poster', params)
+
+        horizon1 = generators.load('horizon1')
+        with np.errstate(all='raise'):
+            horizon1.draw_horizons(3, generators.HORIZON1_MIN_HEIGHT, (0, 0, 0),
+                (255, 255, 255), ([.8] * 3, [.8] * 3))
+            with self.assertRaises(FloatingPointError):
+                horizon1.draw_horizons(3, generators.HORIZON1_MIN_HEIGHT - 1,
+                    (0, 0, 0), (255, 255, 255), ([.8] * 3, [.8] * 3))
+
+class PlanTest(unittest.TestCase):
+    def test_plan(self):
+        jobs = [
+            {'generator': 'sl', 'params': {'seed': 1}},
+            {'generator': 'aphex', 'output': 'a.svg'},
+        ]
+        planned = generate.plan(jobs, 'out')
+        self.assertEqual(planned[0].output, os.path.abspath('out/sl-0.png'))
+        self.assertEqual(planned[1], generate.Job('aphex', {}, os.path.abspath('out/a.svg')))
+
+    def test_plan_errors(self):
+        bad = [
+            {'generator': 'sl'},
+            3,
+            [[1]],
+            [3],
+            [{'params': {}}],
+            [{'generator': 'nope'}],
+            [{'generator': 'sl', 'params': [1]}],
+            [{'generator': 'sl', 'output': 3}],
+            [{'generator': 'aphex', 'params': {'incremental': True}}],
+            [{'generator': 'sl', 'params': {'seed': 'x'}}],
+            [{'generator': 'sl', 'output': 'x.png'}, {'generator': 'sl', 'output': 'x.png'}],
+        ]
+        for jobs in bad:
+            with self.assertRaises(ValueError):
+                generate.plan(jobs)
+
+    def test_dry_run_rejects_out_of_range(self):
+        bad = [
+            ['horizon1', '--preview', '-2'],
+            ['horizon1', '--preview', '0'],
+            ['horizon1', '--preview', '200'],
+            ['horizon1', '--width', '0'],
+            ['horizon1', '--height', '-1'],
+            ['horizon1', '--clouds', '1.5'],
+            ['horizon1', '--clouds', '-.1'],
+            ['sl', '--scale', '0'],
+            ['sl', '--scale', 'nan'],
+            ['sl', '--scale', '85', '--preview', '20'],
+            ['sl-poster', '--count', '0'],
+            ['sl-poster', '--processes', '0'],
+            ['sl-poster', '--scale', '-1'],
+            ['aphex', '--rows', '0'],
+            ['aphex', '--precision', '-1'],
+        ]
+        for args in bad:
+            with self.subTest(args=args), mock.patch('sys.stderr', io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    generate.main(['render'] + args + ['--dry-run'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jobs.json')
+            with open(path, 'w') as f:
+                json.dump([
+                    {'generator': 'sl', 'params': {'scale': 40}},
+                    {'generator': 'horizon1', 'params': {'width': 0}},
+                ], f)
+            with mock.patch('sys.stderr', io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    generate.main(['batch', path, '--output-dir', directory])
+            self.assertFalse(os.path.exists(os.path.join(directory, 'sl-0.png')))
+
+    def test_render(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = generate.plan([
+                {'generator': 'aphex', 'params': {'seed': 1, 'rows': 1}},
+                {'generator': 'sl', 'params': {'scale': 20, 'seed': 1}},
+            ], directory)
+            out = io.StringIO()
+            generate.render(jobs, out=out)
+            for job in jobs:
+                self.assertTrue(os.path.exists(job.output))
+            self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_checks_without_importing_generators(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jobs.json')
+            with open(path, 'w') as f:
+                json.dump([{'generator': 'horizon1', 'params': {'seed': 1}}], f)
+            script = '; '.join([
+                'import sys, generate',
+                'generate.main(["list"])',
+                'generate.main(["batch", {!r}, "--dry-run"])'.format(path),
+                'generate.main(["render", "aphex", "--seed", "1", "--dry-run"])',
+                'print([m for m in ("numpy", "PIL", "svgwrite", "aphex") if m in sys.modules])',
+            ])
+            output = subprocess.check_output(
+                [sys.executable, '-c', script],
+                cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True
+            )
+            self.assertEqual(output.splitlines()[-1], '[]')
+
+if __name__ == '__main__':
+    unittest.main()
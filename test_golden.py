@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+import golden
+
+class GoldenTest(unittest.TestCase):
+    def test_cases_match_golden(self):
+        for result in golden.check():
+            with self.subTest(case=result.name):
+                self.assertTrue(result.passed, result)
+
+    def test_downsample(self):
+        pixels = np.zeros((5, 9, 3), dtype=np.uint8)
+        pixels[:2, :2] = 100
+        result = golden.downsample(pixels, 2)
+        self.assertEqual(result.shape, (2, 4, 3))
+        self.assertEqual(result[0, 0, 0], 100)
+        self.assertEqual(result[0, 1, 0], 0)
+
+    def test_pixel_difference(self):
+        a = np.zeros((2, 2, 3), dtype=np.uint8)
+        b = a.copy()
+        b[1, 1, 2] = 3
+        self.assertEqual(golden.pixel_difference(a, b), 3)
+        self.assertEqual(golden.pixel_difference(b, a), 3)
+        self.assertIsNone(golden.pixel_difference(a, np.zeros((2, 3, 3))))
+
+    def test_number_difference(self):
+        self.assertEqual(golden.number_difference('M 1 2', 'M 1 2'), 0)
+        self.assertAlmostEqual(
+            golden.number_difference('M 1.5 -2', 'M 1.25 -2'), .25
+        )
+        self.assertIsNone(golden.number_difference('M 1 2', 'L 1 2'))
+        self.assertIsNone(golden.number_difference('M 1 2', 'M 1 2 3'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+
+import instrument
+
+def make_module():
+    module = types.ModuleType('fake')
+    module.STAGES = ['outer', 'inner']
+
+    def outer():
+        data = bytearray(100000)
+        module.inner()
+        module.inner()
+        return len(data)
+
+    def inner():
+        return len(bytearray(1000000))
+
+    module.outer = outer
+    module.inner = inner
+    return module
+
+class RecorderTest(unittest.TestCase):
+    def test_instrumented(self):
+        module = make_module()
+        (outer, inner) = (module.outer, module.inner)
+        recorder = instrument.Recorder()
+        with instrument.instrumented(module, recorder):
+            module.outer()
+
+        self.assertIs(module.outer, outer)
+        self.assertIs(module.inner, inner)
+
+        summary = recorder.summary()
+        self.assertEqual(summary['outer']['calls'], 1)
+        self.assertEqual(summary['inner']['calls'], 2)
+        self.assertGreaterEqual(summary['outer']['wall_s'], summary['inner']['wall_s'])
+        # the outer stage's peak includes what it holds plus its inner stages'
+        self.assertGreaterEqual(summary['inner']['peak_bytes'], 1000000)
+        self.assertGreaterEqual(summary['outer']['peak_bytes'], 1100000)
+        self.assertLess(summary['outer']['peak_bytes'], 2000000)
+
+    def test_no_memory(self):
+        module = make_module()
+        recorder = instrument.Recorder(memory=False)
+        with instrument.instrumented(module, recorder):
+            module.outer()
+        self.assertIsNone(recorder.summary()['inner']['peak_bytes'])
+
+    def test_save(self):
+        module = make_module()
+        recorder = instrument.Recorder()
+        with instrument.instrumented(module, recorder):
+            module.outer()
+
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'profile')
+            recorder.save(prefix, generator='fake')
+            with open(prefix + '.json') as f:
+                saved = json.load(f)
+            with open(prefix + '.trace.json') as f:
+                trace = json.load(f)
+
+        self.assertEqual(saved['generator'], 'fake')
+        self.assertEqual(saved['stages']['inner']['calls'], 2)
+        self.assertEqual(
+            sorted(e['name'] for e in trace['traceEvents']),
+            ['inner', 'inner', 'outer']
+        )
+
+class ProfileTest(unittest.TestCase):
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = instrument.profile(
+                'horizon1', os.path.join(directory, 'h.png'),
+                width=32, height=18, seed=1
+            )
+        summary = recorder.summary()
+        self.assertEqual(summary['main']['calls'], 1)
+        self.assertEqual(summary['horizon_scaling']['calls'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
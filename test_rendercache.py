@@ -0,0 +1,114 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import generators
+import rendercache
+
+def noisy(n):
+    return np.array([random.random() for i in range(n)])
+
+def ones(n):
+    return np.ones(n)
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = rendercache.Cache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hit_restores_random_state(self):
+        random.seed(1)
+        first = self.cache.call(noisy, 10)
+        after_first = random.random()
+
+        random.seed(1)
+        second = self.cache.call(noisy, 10)
+        after_second = random.random()
+
+        np.testing.assert_equal(first, second)
+        self.assertEqual(after_first, after_second)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_key(self):
+        random.seed(1)
+        self.cache.call(noisy, 10)
+        self.cache.call(noisy, 11)
+        random.seed(2)
+        self.cache.call(noisy, 10)
+        self.assertEqual(self.cache.stats()['misses'], 3)
+
+    def test_without_random_state(self):
+        random.seed(1)
+        first = self.cache.call(ones, 10, uses_random=False)
+        random.seed(2)
+        state = random.getstate()
+        second = self.cache.call(ones, 10, uses_random=False)
+
+        np.testing.assert_equal(first, second)
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        # calls that use the random state don't share entries with ones that don't
+        self.cache.call(ones, 10)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_sequences_hash_like_arrays(self):
+        random.seed(1)
+        self.assertEqual(
+            self.cache.key(ones, ([1, 2],)),
+            self.cache.key(ones, (np.array([1, 2]),))
+        )
+        self.assertNotEqual(
+            self.cache.key(ones, ([1, 2],)),
+            self.cache.key(ones, ([[1, 2]],))
+        )
+
+    def test_evicts_least_recently_used(self):
+        random.seed(1)
+        self.cache.call(ones, 1000)
+        size = self.cache.stats()['bytes']
+        self.cache.max_bytes = size * 2.5
+
+        # make sure mtimes differ
+        time.sleep(.01)
+        self.cache.call(ones, 1001)
+        time.sleep(.01)
+        self.cache.call(ones, 1000)
+        time.sleep(.01)
+        self.cache.call(ones, 1002)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        # 1000 was used more recently than 1001, so it survives
+        self.cache.call(ones, 1000)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_cached_render_matches(self):
+        for name in ['sl', 'horizon1']:
+            params = {'seed': 5}
+            if name == 'sl':
+                params['scale'] = 20
+            else:
+                params.update(width=64, height=36)
+            with self.subTest(generator=name):
+                outputs = []
+                for cache in [None, self.cache, self.cache]:
+                    path = os.path.join(self.directory.name, name + '.png')
+                    generators.render(name, path, cache, **params)
+                    outputs.append(np.asarray(Image.open(path)))
+                np.testing.assert_equal(outputs[0], outputs[1])
+                np.testing.assert_equal(outputs[0], outputs[2])
+
+        self.assertGreater(self.cache.stats()['hits'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+import renderd
+
+class RenderdTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = renderd.make_server(0)
+        cls.port = cls.server.server_port
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.server.server_close()
+
+    def test_render_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'h.png')
+            reply = renderd.submit({
+                'generator': 'horizon1',
+                'params': {'width': 32, 'height': 18, 'seed': 1},
+                'output': output,
+            }, self.port)
+            self.assertEqual(reply['output'], output)
+            self.assertGreater(reply['ms'], 0)
+            self.assertTrue(os.path.exists(output))
+
+    def test_render_to_reply(self):
+        (body, ms) = renderd.submit({
+            'generator': 'aphex',
+            'params': {'seed': 1, 'precision': 1, 'construction': False},
+        }, self.port)
+        self.assertIn(b'<svg', body)
+        self.assertGreater(ms, 0)
+
+    def test_null_output_renders_to_reply(self):
+        (body, _) = renderd.submit({
+            'generator': 'horizon1',
+            'params': {'width': 32, 'height': 18, 'seed': 1},
+            'output': None,
+        }, self.port)
+        self.assertTrue(body.startswith(b'\x89PNG'))
+
+    def test_bad_job(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            renderd.submit({'generator': 'nope'}, self.port)
+        self.assertEqual(context.exception.code, 400)
+        self.assertIn('unknown generator', json.loads(context.exception.read())['error'])
+
+    def test_stats(self):
+        renderd.submit({
+            'generator': 'horizon1',
+            'params': {'width': 32, 'height': 18},
+        }, self.port)
+        with urllib.request.urlopen(
+            'http://127.0.0.1:{}/stats'.format(self.port)
+        ) as response:
+            stats = json.loads(response.read())
+        self.assertGreaterEqual(stats['horizon1']['jobs'], 1)
+
+if __name__ == '__main__':
+    unittest.main()